@@ -1,9 +1,9 @@
-"""
-E_Sic (e-SIC) é um pacote que tem como objetivo facilitar o acesso a todos os dados que a plataforma consultaesic
-disponibiliza.
-"""
-
-__author__ = 'Henrique da Silva Santos'
-__copyright__ = 'Copyright 2020, e-SIC Scraper'
-__credits__ = []
-__license__ = 'GNU General Public License V3'
+"""
+E_Sic (e-SIC) é um pacote que tem como objetivo facilitar o acesso a todos os dados que a plataforma consultaesic
+disponibiliza.
+"""
+
+__author__ = 'Henrique da Silva Santos'
+__copyright__ = 'Copyright 2020, e-SIC Scraper'
+__credits__ = []
+__license__ = 'GNU General Public License V3'
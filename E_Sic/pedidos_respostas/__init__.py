@@ -1,7 +1,15 @@
-from E_Sic.pedidos_respostas.search import BuscarPedidosRespostas
-from E_Sic.pedidos_respostas.parser import FileParser
-from E_Sic.pedidos_respostas import types
-
-__description__ = (
-    "Esta seção disponibliza a base de dados dos pedidos e respostas realizados no Poder Executivo Federal,"
-    " por meio do e-SIC, em formatos CSV e XML.",)
+from E_Sic.pedidos_respostas.search import BuscarPedidosRespostas, AsyncBuscarPedidosRespostas
+from E_Sic.pedidos_respostas.parser import FileParser
+from E_Sic.pedidos_respostas.manifest import DownloadManifest
+from E_Sic.pedidos_respostas.export import ParquetExporter
+from E_Sic.pedidos_respostas.storage import SQLiteSink
+from E_Sic.pedidos_respostas.index import RelationalIndex
+from E_Sic.pedidos_respostas.delta import FingerprintStore
+from E_Sic.pedidos_respostas.fulltext import FullTextIndex
+from E_Sic.pedidos_respostas.analytics import ComplianceStats
+from E_Sic.pedidos_respostas.metrics import Metrics
+from E_Sic.pedidos_respostas import types
+
+__description__ = (
+    "Esta seção disponibliza a base de dados dos pedidos e respostas realizados no Poder Executivo Federal,"
+    " por meio do e-SIC, em formatos CSV e XML.",)
@@ -0,0 +1,237 @@
+"""
+Compliance statistics (response time, deadlines, extensions and appeals) computed over columnar NumPy arrays.
+"""
+import itertools, typing
+from E_Sic.pedidos_respostas.converters import to_timestamps
+from E_Sic.pedidos_respostas.conts import _ANALYTICS_BATCH_SIZE_, _HISTOGRAM_DAYS_
+from E_Sic.pedidos_respostas.types import Pedido, Recurso
+
+try:
+    import numpy
+except ImportError:  # Optional, pip install E_Sic[analytics]
+    numpy = None
+
+_DAY = 24 * 60 * 60
+
+# Columns of ComplianceStats.counts
+_COUNTERS = ("pedidos", "respondidos", "fora_do_prazo", "prorrogados", "recursos")
+
+
+class PedidoColumns(typing.NamedTuple):
+    """
+    Pedidos as columns: the group is a categorical code (index of "categories") and the dates are seconds
+    since 1970-01-01 (NaN when blank).
+    """
+    categories: typing.List[str]
+    group: "numpy.ndarray"
+    data_registro: "numpy.ndarray"
+    data_resposta: "numpy.ndarray"
+    prazo_atendimento: "numpy.ndarray"
+    foi_prorrogado: "numpy.ndarray"
+
+    @classmethod
+    def from_records(cls, records: typing.Iterable[dict], group_by: str = "OrgaoDestinatario") -> "PedidoColumns":
+        """
+        :param records: Iterable<Pedido>
+        :param group_by: Categorical column used as group
+        :return: PedidoColumns
+        """
+        records = list(records)
+        categories, group = _categorical(record.get(group_by, "") for record in records)
+
+        return cls(
+            categories=categories,
+            group=group,
+            data_registro=_timestamps(record.get("DataRegistro", "") for record in records),
+            data_resposta=_timestamps(record.get("DataResposta", "") for record in records),
+            prazo_atendimento=_timestamps(record.get("PrazoAtendimento", "") for record in records),
+            foi_prorrogado=numpy.fromiter(
+                ((record.get("FoiProrrogado") or "").strip().upper() == "SIM" for record in records),
+                dtype=bool, count=len(records)
+            ),
+        )
+
+
+class ComplianceStats:
+    """
+    Partial aggregates per group (OrgaoDestinatario by default), they can be updated batch by batch
+    and merged with the ones computed elsewhere (other years, processes or machines), so the data never
+    needs to fit in memory.
+
+    stats = ComplianceStats.aggregate(FileParser(file_location).open())
+    stats.merge(ComplianceStats.aggregate(FileParser(other_file).open()))
+    stats.result()
+
+    A pedido is out of time when it was answered on a day after PrazoAtendimento,
+    the appeal rate counts only the first recurso of each chain (no IdRecursoPrecedente).
+    """
+
+    def __init__(self, group_by: str = "OrgaoDestinatario", histogram_days: int = _HISTOGRAM_DAYS_):
+        """
+        :param group_by: Column used as group, present in pedidos and recursos
+        :param histogram_days: Response time histogram size (days), used by the median, longer times share the last bin
+        """
+        if numpy is None:
+            raise ImportError("numpy is required by the analytics module (pip install E_Sic[analytics]).")
+
+        self.group_by = group_by
+        self.histogram_days = histogram_days
+        self.groups = {}
+        self.counts = numpy.zeros((0, len(_COUNTERS)), dtype=numpy.int64)
+        self.response_seconds = numpy.zeros(0, dtype=numpy.float64)
+        self.histogram = numpy.zeros((0, histogram_days + 1), dtype=numpy.int64)
+
+    @classmethod
+    def aggregate(cls, records: typing.Iterable[dict], batch_size: int = _ANALYTICS_BATCH_SIZE_,
+                  **kwargs) -> "ComplianceStats":
+        """
+        Consumes the records in batches, only one batch is kept in memory.
+        :param records: Iterable<Pedido|Recurso>
+        :param batch_size: Records converted to columns at a time
+        :param kwargs: ComplianceStats arguments
+        :return: ComplianceStats
+        """
+        stats = cls(**kwargs)
+        records = iter(records)
+
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+
+            if not batch:
+                return stats
+
+            stats.update(batch)
+
+    def update(self, records: typing.Iterable[dict]) -> "ComplianceStats":
+        """
+        Adds a batch of records (other types are ignored)
+        :param records: Iterable<Pedido|Recurso>
+        :return: self
+        """
+        pedidos, recursos = [], []
+
+        for record in records:
+            if isinstance(record, Pedido):
+                pedidos.append(record)
+            elif isinstance(record, Recurso):
+                recursos.append(record)
+
+        if pedidos:
+            self._add_pedidos(PedidoColumns.from_records(pedidos, self.group_by))
+
+        if recursos:
+            categories, group = _categorical(
+                record.get(self.group_by, "") for record in recursos
+                if not (record.get("IdRecursoPrecedente") or "").strip()
+            )
+            rows = self._rows(categories)
+            self.counts[:, _COUNTERS.index("recursos")] += numpy.bincount(rows[group], minlength=len(self.groups))
+
+        return self
+
+    def merge(self, other: "ComplianceStats") -> "ComplianceStats":
+        """
+        :param other: Partial aggregates of other records (same histogram size)
+        :return: self
+        """
+        if other.histogram_days != self.histogram_days:
+            raise ValueError("Only stats with the same histogram size can be merged.")
+
+        rows = self._rows(list(other.groups))
+        self.counts[rows] += other.counts
+        self.response_seconds[rows] += other.response_seconds
+        self.histogram[rows] += other.histogram
+        return self
+
+    def result(self) -> typing.List[dict]:
+        """
+        :return: One dict per group (times in days, rates between 0 and 1), biggest groups first
+        """
+        counts = {name: self.counts[:, index].astype(numpy.float64) for index, name in enumerate(_COUNTERS)}
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            mean = self.response_seconds / counts["respondidos"] / _DAY
+            late = counts["fora_do_prazo"] / counts["respondidos"]
+            extended = counts["prorrogados"] / counts["pedidos"]
+            appealed = counts["recursos"] / counts["pedidos"]
+
+        # Median from the histogram: first day whose cumulative count reaches half of the answered pedidos.
+        cumulative = numpy.cumsum(self.histogram, axis=1)
+        median = (cumulative < (cumulative[:, -1:] + 1) // 2).sum(axis=1).astype(numpy.float64)
+        median[counts["respondidos"] == 0] = numpy.nan
+
+        rows = []
+
+        for name, row in sorted(self.groups.items(), key=lambda item: -self.counts[item[1], 0]):
+            rows.append({
+                self.group_by: name,
+                "pedidos": int(self.counts[row, 0]),
+                "respondidos": int(self.counts[row, 1]),
+                "tempo_resposta_medio": _number(mean[row]),
+                "tempo_resposta_mediano": _number(median[row]),
+                "fora_do_prazo": int(self.counts[row, 2]),
+                "taxa_fora_do_prazo": _number(late[row]),
+                "prorrogados": int(self.counts[row, 3]),
+                "taxa_prorrogacao": _number(extended[row]),
+                "recursos": int(self.counts[row, 4]),
+                "taxa_recurso": _number(appealed[row]),
+            })
+
+        return rows
+
+    def _add_pedidos(self, columns: PedidoColumns):
+        rows = self._rows(columns.categories)
+        group = rows[columns.group]
+        size = len(self.groups)
+
+        answered = ~numpy.isnan(columns.data_resposta) & ~numpy.isnan(columns.data_registro)
+        seconds = columns.data_resposta[answered] - columns.data_registro[answered]
+        # Compared by day, the deadline usually has no time.
+        late = answered & (numpy.floor(columns.data_resposta / _DAY) > numpy.floor(columns.prazo_atendimento / _DAY))
+
+        self.counts[:, 0] += numpy.bincount(group, minlength=size)
+        self.counts[:, 1] += numpy.bincount(group[answered], minlength=size)
+        self.counts[:, 2] += numpy.bincount(group[late], minlength=size)
+        self.counts[:, 3] += numpy.bincount(group[columns.foi_prorrogado], minlength=size)
+        self.response_seconds += numpy.bincount(group[answered], weights=seconds, minlength=size)
+
+        days = numpy.clip(seconds // _DAY, 0, self.histogram_days).astype(numpy.int64)
+        numpy.add.at(self.histogram, (group[answered], days), 1)
+
+    def _rows(self, names: typing.List[str]) -> "numpy.ndarray":
+        """
+        Global row of each group name, new groups get zeroed rows.
+        :param names: Group names
+        :return: Array of row indexes
+        """
+        rows = numpy.fromiter((self.groups.setdefault(name, len(self.groups)) for name in names),
+                              dtype=numpy.int64, count=len(names))
+        grow = len(self.groups) - len(self.counts)
+
+        if grow:
+            self.counts = numpy.concatenate([self.counts, numpy.zeros((grow, len(_COUNTERS)), dtype=numpy.int64)])
+            self.response_seconds = numpy.concatenate([self.response_seconds, numpy.zeros(grow)])
+            self.histogram = numpy.concatenate(
+                [self.histogram, numpy.zeros((grow, self.histogram_days + 1), dtype=numpy.int64)]
+            )
+
+        return rows
+
+
+def _categorical(values: typing.Iterable[str]) -> typing.Tuple[typing.List[str], "numpy.ndarray"]:
+    """
+    :param values: Column values
+    :return: tuple(categories, code of each value)
+    """
+    categories = {}
+    codes = numpy.fromiter((categories.setdefault(value, len(categories)) for value in values), dtype=numpy.int64)
+    return list(categories), codes
+
+
+def _timestamps(values: typing.Iterable[str]) -> "numpy.ndarray":
+    return numpy.array([numpy.nan if value is None else value for value in to_timestamps(values)],
+                       dtype=numpy.float64)
+
+
+def _number(value: float) -> typing.Optional[float]:
+    return None if numpy.isnan(value) else float(value)
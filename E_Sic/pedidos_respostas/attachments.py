@@ -0,0 +1,111 @@
+import hashlib, json, os, typing
+
+_MANIFEST_NAME_ = "attachments.json"
+
+
+class AttachmentStore:
+    """
+    Content addressed storage of the attachments: each file is kept once, in objects/<2 chars>/<sha256>,
+    no matter how many pedidos (or urls) point to it. attachments.json maps each protocol to its files.
+    """
+
+    _path: str = ""
+
+    def __init__(self, path: str = "."):
+        """
+        :param path: Storage directory
+        """
+        self._path = path
+        self._urls = {}
+        self._protocols = {}
+
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(path, "tmp"), exist_ok=True)
+
+        manifest = os.path.join(path, _MANIFEST_NAME_)
+
+        if os.path.exists(manifest):
+            with open(manifest, "r", encoding="utf-8") as handler:
+                data = json.load(handler)
+                self._urls = data.get("urls", {})
+                self._protocols = data.get("protocols", {})
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self._path, "objects", sha256[:2], sha256)
+
+    def part_path(self, url: str) -> str:
+        """
+        The partial download is named after the url, so a broken download can be resumed in the next run.
+        :param url: Attachment url
+        :return: Temporary file location
+        """
+        return os.path.join(self._path, "tmp", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+    def has_url(self, url: str) -> bool:
+        entry = self._urls.get(url)
+        return entry is not None and os.path.exists(self.object_path(entry["sha256"]))
+
+    def add(self, url: str, part_path: str, sha256: str) -> str:
+        """
+        Moves a finished download to its place, when the content is already stored the copy is dropped.
+        :param url: Attachment url
+        :param part_path: Downloaded file
+        :param sha256: Content hash
+        :return: Object location
+        """
+        object_path = self.object_path(sha256)
+        size = os.path.getsize(part_path)
+
+        if os.path.exists(object_path):
+            os.remove(part_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(part_path, object_path)
+
+        self._urls[url] = {"sha256": sha256, "size": size}
+        return object_path
+
+    def link(self, protocolo: str, files: typing.Iterable[tuple],
+             errors: typing.Mapping[str, Exception] = None) -> typing.List[dict]:
+        """
+        Records the files of a protocol
+        :param protocolo: Protocol number (NUP)
+        :param files: Iterable( file_url, file_name )
+        :param errors: url => error of the downloads that failed
+        :return: List of {"name", "url", "sha256", "size", "path"} (sha256 and path are None when it failed)
+        """
+        entries = []
+
+        for url, name in sorted(files):
+            stored = self._urls.get(url) if self.has_url(url) else None
+            entry = {
+                "name": name,
+                "url": url,
+                "sha256": stored["sha256"] if stored else None,
+                "size": stored["size"] if stored else None,
+                "path": self.object_path(stored["sha256"]) if stored else None,
+            }
+
+            if errors and url in errors:
+                entry["error"] = str(errors[url])
+
+            entries.append(entry)
+
+        self._protocols[protocolo] = entries
+        return entries
+
+    def files(self, protocolo: str) -> typing.List[dict]:
+        return list(self._protocols.get(protocolo, ()))
+
+    def save(self):
+        manifest = os.path.join(self._path, _MANIFEST_NAME_)
+        temporary = manifest + ".tmp"
+
+        with open(temporary, "w", encoding="utf-8") as handler:
+            json.dump({"urls": self._urls, "protocols": self._protocols}, handler, indent=2)
+
+        os.replace(temporary, manifest)
+
+    @property
+    def path(self) -> str:
+        return self._path
@@ -1,15 +1,76 @@
-_PROTOCOL_ = "http"
-_DOMAIN_ = "www.consultaesic.cgu.gov.br"
-_PATH_ = "busca/_layouts/15/DownloadPedidos/DownloadDados.aspx"
-_URL_ = f"{_PROTOCOL_}://{_DOMAIN_}/{_PATH_}"
-_FORM_SUBMIT_ = _URL_
-_ENCODING_ = "utf-8"
-_SELECT_YEAR_ = "ctl00$PlaceHolderMain$cmbAno"
-_SELECT_FORMAT_ = "ctl00$PlaceHolderMain$cmbFormato"
-_MIN_YEAR = 2016
-_ALOWED_FORMAT = set(("CSV", "XML",))
-_SEARCH_REQUEST_PROTOCOL = f"{_PROTOCOL_}://{_DOMAIN_}/busca/SitePages/resultadopesquisa.aspx?k="
-_SEARCH_REQUEST_URL_ = f"{_PROTOCOL_}://{_DOMAIN_}/busca/dados/Lists/Pedido/Item/displayifs.aspx?ID="
-
-_PROCESS_QUERY_URL = f"{_PROTOCOL_}://{_DOMAIN_}/busca/_vti_bin/client.svc/ProcessQuery"
+_PROTOCOL_ = "http"
+_DOMAIN_ = "www.consultaesic.cgu.gov.br"
+_PATH_ = "busca/_layouts/15/DownloadPedidos/DownloadDados.aspx"
+_URL_ = f"{_PROTOCOL_}://{_DOMAIN_}/{_PATH_}"
+_FORM_SUBMIT_ = _URL_
+_ENCODING_ = "utf-8"
+_SELECT_YEAR_ = "ctl00$PlaceHolderMain$cmbAno"
+_SELECT_FORMAT_ = "ctl00$PlaceHolderMain$cmbFormato"
+_MIN_YEAR = 2016
+_ALOWED_FORMAT = set(("CSV", "XML",))
+_CHUNK_SIZE_ = 1024 * 1024
+_DOWNLOAD_RETRIES_ = 5
+_RETRY_STATUS_ = set((429, 500, 502, 503, 504,))
+_BACKOFF_BASE_ = 0.5
+_BACKOFF_MAX_ = 30
+_CONNECT_TIMEOUT_ = 30
+_READ_TIMEOUT_ = 120
+_EXTRACT_WORKERS_ = 4
+
+# Seconds the DownloadDados.aspx form fields are reused before fetching the page again
+_FORM_STATE_TTL_ = 30 * 60
+# Saved next to a ".part" file: ETag/Last-Modified of the version being downloaded (resumed only if unchanged)
+_VALIDATOR_SUFFIX_ = ".validator"
+
+_RESOLVER_CACHE_TTL_ = 7 * 24 * 60 * 60
+
+# Column order of the exported files (Dicionario-Dados-Exportacao.txt), the CSV files come without header.
+_PEDIDO_FIELDS_ = (
+    "IdPedido", "ProtocoloPedido", "OrgaoSuperiorAssociadoaoDestinatario", "OrgaoDestinatario", "Situacao",
+    "DataRegistro", "ResumoSolicitacao", "DetalhamentoSolicitacao", "PrazoAtendimento", "FoiProrrogado",
+    "FoiReencaminhado", "FormaResposta", "OrigemSolicitacao", "IdSolicitante", "CategoriaPedido", "SubCategoriaPedido",
+    "NumeroPerguntas", "DataResposta", "Resposta", "TipoResposta", "ClassificacaoTipoResposta",
+)
+_RECURSO_FIELDS_ = (
+    "IdRecurso", "IdRecursoPrecedente", "DescRecurso", "IdPedido", "IdSolicitante", "ProtocoloPedido",
+    "OrgaoSuperiorAssociadoaoDestinatario", "OrgaoDestinatario", "Instancia", "Situacao", "DataRegistro",
+    "PrazoAtendimento", "OrigemSolicitacao", "TipoRecurso", "DataResposta", "RespostaRecurso", "TipoResposta",
+)
+_SOLICITANTE_FIELDS_ = (
+    "IdSolicitante", "TipoDemandante", "DataNascimento", "Sexo", "Escolaridade", "Profissao", "TipoPessoaJuridica",
+    "Pais", "UF", "Municipio",
+)
+_INT_FIELDS_ = set(("IdPedido", "IdRecurso", "IdRecursoPrecedente", "IdSolicitante", "NumeroPerguntas",))
+_DATETIME_FIELDS_ = set(("DataRegistro", "PrazoAtendimento", "DataResposta",))
+_DATE_FIELDS_ = set(("DataNascimento",))
+_BOOL_FIELDS_ = set(("FoiProrrogado", "FoiReencaminhado",))
+# Few distinct values repeated in every record.
+_CATEGORICAL_FIELDS_ = set((
+    "OrgaoSuperiorAssociadoaoDestinatario", "OrgaoDestinatario", "Situacao", "FormaResposta", "OrigemSolicitacao",
+    "CategoriaPedido", "SubCategoriaPedido", "TipoResposta", "ClassificacaoTipoResposta", "Instancia", "TipoRecurso",
+    "TipoDemandante", "Sexo", "Escolaridade", "TipoPessoaJuridica", "Pais", "UF", "Municipio",
+))
+# Long texts typed by people, where a stray ";" or line break usually shows up.
+_FREE_TEXT_FIELDS_ = (
+    "DetalhamentoSolicitacao", "Resposta", "ResumoSolicitacao", "DescRecurso", "RespostaRecurso", "Profissao",
+)
+_CSV_FIELD_SIZE_LIMIT_ = 16 * 1024 * 1024
+# Indexed by the full-text search, in this order.
+_TEXT_FIELDS_ = ("ResumoSolicitacao", "DetalhamentoSolicitacao", "Resposta", "DescRecurso", "RespostaRecurso",)
+# Full-text index: documents per segment and how many segments of the same size are merged together
+_SEGMENT_SIZE_ = 50000
+_MERGE_FACTOR_ = 10
+# Analytics: records converted to columns at a time and days covered by the response time histogram
+_ANALYTICS_BATCH_SIZE_ = 100000
+_HISTOGRAM_DAYS_ = 365
+
+# FileParser async iteration: records per batch and batches waiting in the queue
+_PARSE_BATCH_SIZE_ = 1000
+_PARSE_QUEUE_SIZE_ = 4
+_SEARCH_REQUEST_PROTOCOL = f"{_PROTOCOL_}://{_DOMAIN_}/busca/SitePages/resultadopesquisa.aspx?k="
+_SEARCH_REQUEST_URL_ = f"{_PROTOCOL_}://{_DOMAIN_}/busca/dados/Lists/Pedido/Item/displayifs.aspx?ID="
+
+_PROCESS_QUERY_URL = f"{_PROTOCOL_}://{_DOMAIN_}/busca/_vti_bin/client.svc/ProcessQuery"
+# Protocol written in the template below, replaced by the one we are looking for.
+_XML_REQUEST_SAMPLE_NUP = "99901000001201633"
 _XML_REQUEST_TEMPLATE = """<Request xmlns="http://schemas.microsoft.com/sharepoint/clientquery/2009" SchemaVersion="15.0.0.0" LibraryVersion="15.0.0.0" ApplicationName="Javascript Library"><Actions><ObjectPath Id="1" ObjectPathId="0" /><SetProperty Id="2" ObjectPathId="0" Name="TimeZoneId"><Parameter Type="Number">8</Parameter></SetProperty><SetProperty Id="3" ObjectPathId="0" Name="QueryText"><Parameter Type="String">NUP=99901000001201633</Parameter></SetProperty><SetProperty Id="4" ObjectPathId="0" Name="QueryTemplate"><Parameter Type="String">{searchboxquery}</Parameter></SetProperty><SetProperty Id="5" ObjectPathId="0" Name="Culture"><Parameter Type="Number">-1</Parameter></SetProperty><SetProperty Id="6" ObjectPathId="0" Name="RowsPerPage"><Parameter Type="Number">10</Parameter></SetProperty><SetProperty Id="7" ObjectPathId="0" Name="RowLimit"><Parameter Type="Number">10</Parameter></SetProperty><SetProperty Id="8" ObjectPathId="0" Name="TotalRowsExactMinimum"><Parameter Type="Number">11</Parameter></SetProperty><SetProperty Id="9" ObjectPathId="0" Name="Refiners"><Parameter Type="String">RefinableString09(filter=50/0/*),TipoRespostaRefinable(filter=10/0/*)</Parameter></SetProperty><ObjectPath Id="11" ObjectPathId="10" /><Method Name="Add" Id="12" ObjectPathId="10"><Parameters><Parameter Type="String">Title</Parameter></Parameters></Method><Method Name="Add" Id="13" ObjectPathId="10"><Parameters><Parameter Type="String">Path</Parameter></Parameters></Method><Method Name="Add" Id="14" ObjectPathId="10"><Parameters><Parameter Type="String">Description</Parameter></Parameters></Method><Method Name="Add" Id="15" ObjectPathId="10"><Parameters><Parameter Type="String">EditorOWSUSER</Parameter></Parameters></Method><Method Name="Add" Id="16" ObjectPathId="10"><Parameters><Parameter Type="String">LastModifiedTime</Parameter></Parameters></Method><Method Name="Add" Id="17" ObjectPathId="10"><Parameters><Parameter Type="String">CollapsingStatus</Parameter></Parameters></Method><Method Name="Add" Id="18" ObjectPathId="10"><Parameters><Parameter Type="String">DocId</Parameter></Parameters></Method><Method Name="Add" Id="19" ObjectPathId="10"><Parameters><Parameter Type="String">HitHighlightedSummary</Parameter></Parameters></Method><Method Name="Add" Id="20" ObjectPathId="10"><Parameters><Parameter Type="String">HitHighlightedProperties</Parameter></Parameters></Method><Method Name="Add" Id="21" ObjectPathId="10"><Parameters><Parameter Type="String">FileExtension</Parameter></Parameters></Method><Method Name="Add" Id="22" ObjectPathId="10"><Parameters><Parameter Type="String">ViewsLifeTime</Parameter></Parameters></Method><Method Name="Add" Id="23" ObjectPathId="10"><Parameters><Parameter Type="String">ParentLink</Parameter></Parameters></Method><Method Name="Add" Id="24" ObjectPathId="10"><Parameters><Parameter Type="String">FileType</Parameter></Parameters></Method><Method Name="Add" Id="25" ObjectPathId="10"><Parameters><Parameter Type="String">IsContainer</Parameter></Parameters></Method><Method Name="Add" Id="26" ObjectPathId="10"><Parameters><Parameter Type="String">SecondaryFileExtension</Parameter></Parameters></Method><Method Name="Add" Id="27" ObjectPathId="10"><Parameters><Parameter Type="String">DisplayAuthor</Parameter></Parameters></Method><Method Name="Add" Id="28" ObjectPathId="10"><Parameters><Parameter Type="String">TipoRespostaRefinable</Parameter></Parameters></Method><Method Name="Add" Id="29" ObjectPathId="10"><Parameters><Parameter Type="String">RefinableDate00</Parameter></Parameters></Method><Method Name="Add" Id="30" ObjectPathId="10"><Parameters><Parameter Type="String">RefinableString09</Parameter></Parameters></Method><Method Name="Add" Id="31" ObjectPathId="10"><Parameters><Parameter Type="String">PalavrasChave</Parameter></Parameters></Method><Method Name="Add" Id="32" ObjectPathId="10"><Parameters><Parameter Type="String">SubcategoriaQueryable</Parameter></Parameters></Method><ObjectPath Id="34" ObjectPathId="33" /><Method Name="Add" Id="35" ObjectPathId="33"><Parameters><Parameter Type="String">Title</Parameter></Parameters></Method><Method Name="Add" Id="36" ObjectPathId="33"><Parameters><Parameter Type="String">Path</Parameter></Parameters></Method><Method Name="Add" Id="37" ObjectPathId="33"><Parameters><Parameter Type="String">Author</Parameter></Parameters></Method><Method Name="Add" Id="38" ObjectPathId="33"><Parameters><Parameter Type="String">SectionNames</Parameter></Parameters></Method><Method Name="Add" Id="39" ObjectPathId="33"><Parameters><Parameter Type="String">SiteDescription</Parameter></Parameters></Method><ObjectPath Id="41" ObjectPathId="40" /><Method Name="SetQueryPropertyValue" Id="42" ObjectPathId="40"><Parameters><Parameter Type="String">ListId</Parameter><Parameter TypeId="{b25ba502-71d7-4ae4-a701-4ca2fb1223be}"><Property Name="BoolVal" Type="Boolean">false</Property><Property Name="IntVal" Type="Number">0</Property><Property Name="QueryPropertyValueTypeIndex" Type="Number">1</Property><Property Name="StrArray" Type="Null" /><Property Name="StrVal" Type="String">adfebea8-fdb9-4fb6-9482-7799b6bd5001</Property></Parameter></Parameters></Method><Method Name="SetQueryPropertyValue" Id="43" ObjectPathId="40"><Parameters><Parameter Type="String">ListItemId</Parameter><Parameter TypeId="{b25ba502-71d7-4ae4-a701-4ca2fb1223be}"><Property Name="BoolVal" Type="Boolean">false</Property><Property Name="IntVal" Type="Number">8</Property><Property Name="QueryPropertyValueTypeIndex" Type="Number">2</Property><Property Name="StrArray" Type="Null" /><Property Name="StrVal" Type="Null" /></Parameter></Parameters></Method><SetProperty Id="44" ObjectPathId="0" Name="ResultsUrl"><Parameter Type="String">http://www.consultaesic.cgu.gov.br/busca/SitePages/resultadopesquisa.aspx?k=NUP%3D99901000001201633</Parameter></SetProperty><SetProperty Id="45" ObjectPathId="0" Name="BypassResultTypes"><Parameter Type="Boolean">true</Parameter></SetProperty><SetProperty Id="46" ObjectPathId="0" Name="ClientType"><Parameter Type="String">UI</Parameter></SetProperty><Method Name="SetQueryPropertyValue" Id="47" ObjectPathId="40"><Parameters><Parameter Type="String">QuerySession</Parameter><Parameter TypeId="{b25ba502-71d7-4ae4-a701-4ca2fb1223be}"><Property Name="BoolVal" Type="Boolean">false</Property><Property Name="IntVal" Type="Number">0</Property><Property Name="QueryPropertyValueTypeIndex" Type="Number">1</Property><Property Name="StrArray" Type="Null" /><Property Name="StrVal" Type="String">720eaf36-4010-4e9d-9d19-47fc8ca72c44</Property></Parameter></Parameters></Method><SetProperty Id="48" ObjectPathId="0" Name="ProcessPersonalFavorites"><Parameter Type="Boolean">false</Parameter></SetProperty><SetProperty Id="49" ObjectPathId="0" Name="SafeQueryPropertiesTemplateUrl"><Parameter Type="String">querygroup://webroot/SitePages/resultadopesquisa.aspx?groupname=Default</Parameter></SetProperty><SetProperty Id="50" ObjectPathId="0" Name="IgnoreSafeQueryPropertiesTemplateUrl"><Parameter Type="Boolean">false</Parameter></SetProperty><ObjectPath Id="52" ObjectPathId="51" /><ExceptionHandlingScope Id="53"><TryScope Id="55"><Method Name="ExecuteQueries" Id="57" ObjectPathId="51"><Parameters><Parameter Type="Array"><Object Type="String">4c4216f6-6a3f-42ef-900b-dc29ad812c53Default</Object></Parameter><Parameter Type="Array"><Object ObjectPathId="0" /></Parameter><Parameter Type="Boolean">true</Parameter></Parameters></Method></TryScope><CatchScope Id="59" /></ExceptionHandlingScope></Actions><ObjectPaths><Constructor Id="0" TypeId="{80173281-fffd-47b6-9a49-312e06ff8428}" /><Property Id="10" ParentId="0" Name="SelectProperties" /><Property Id="33" ParentId="0" Name="HitHighlightedProperties" /><Property Id="40" ParentId="0" Name="Properties" /><Constructor Id="51" TypeId="{8d2ac302-db2f-46fe-9015-872b35f15098}" /></ObjectPaths></Request>"""
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Conversion of the text values found in the portal files, blank values become None.
+"""
+import datetime, typing
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_FALLBACK_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+
+def to_int(value: str) -> typing.Optional[int]:
+    value = value.strip()
+    return int(value) if value else None
+
+
+def to_datetime(value: str) -> typing.Optional[datetime.datetime]:
+    """
+    Parses "DD/MM/AAAA HH:MM:SS" (or "DD/MM/AAAA") slicing the string, several times faster than strptime.
+    Anything else goes to strptime.
+    :param value: Date as found in the files
+    :return: datetime or None when blank
+    """
+    value = value.strip()
+
+    if not value:
+        return None
+
+    if value[2:3] == "/" and value[5:6] == "/":
+        try:
+            if len(value) == 19 and value[13] == ":" and value[16] == ":":
+                return datetime.datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]),
+                                         int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+            if len(value) == 10:
+                return datetime.datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]))
+        except ValueError:
+            pass
+
+    for date_format in _FALLBACK_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+
+    raise ValueError(f"time data {value!r} does not match format 'DD/MM/AAAA HH:MM:SS'")
+
+
+def to_date(value: str) -> typing.Optional[datetime.date]:
+    value = to_datetime(value)
+    return value.date() if value else None
+
+
+def to_bool(value: str) -> typing.Optional[bool]:
+    value = value.strip()
+    return value.upper() == "SIM" if value else None
+
+
+def to_datetimes(values: typing.Iterable[str]) -> typing.List[typing.Optional[datetime.datetime]]:
+    """
+    Converts a whole column at once, each distinct value is parsed only once
+    (deadlines and dates repeat a lot inside a year).
+    :param values: Dates as found in the files
+    :return: List of datetime (None when blank)
+    """
+    parsed = {}
+    result = []
+
+    for value in values:
+        try:
+            result.append(parsed[value])
+        except KeyError:
+            result.append(parsed.setdefault(value, to_datetime(value)))
+
+    return result
+
+
+def to_timestamps(values: typing.Iterable[str]) -> typing.List[typing.Optional[float]]:
+    """
+    Same as to_datetimes, but returns seconds since 1970-01-01 of the wall clock time
+    written in the file (no timezone conversion).
+    :param values: Dates as found in the files
+    :return: List of float (None when blank)
+    """
+    return [(value - _EPOCH).total_seconds() if value is not None else None for value in to_datetimes(values)]
+
+
+def cached(record: typing.Mapping[str, str], key: str,
+           converter: typing.Callable[[str], typing.Any] = to_datetime) -> typing.Any:
+    """
+    Converts a record attribute only once, the result is kept in the record while the raw value does not change.
+    :param record: Pedido, Recurso or Solicitante
+    :param key: Attribute name
+    :param converter: Conversion function
+    :return: Converted value
+    """
+    raw = record.get(key, "")
+    cache = record._date_cache
+
+    if cache is None:
+        cache = record._date_cache = {}
+
+    hit = cache.get(key)
+
+    if hit is not None and hit[0] == raw:
+        return hit[1]
+
+    value = converter(raw)
+    cache[key] = (raw, value)
+    return value
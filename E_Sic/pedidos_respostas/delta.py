@@ -0,0 +1,149 @@
+import hashlib, sqlite3, typing
+from E_Sic.pedidos_respostas.converters import to_int
+from E_Sic.pedidos_respostas.types import Pedido, Recurso, Solicitante
+
+INSERTED = "inserted"
+CHANGED = "changed"
+REMOVED = "removed"
+
+_RECORD_TYPES = (Pedido, Recurso, Solicitante)
+
+# Fingerprint size (bytes), collisions between two versions of the same record are negligible.
+_DIGEST_SIZE = 8
+
+
+class Change(typing.NamedTuple):
+    """
+    One difference between the snapshot being read and the previous one.
+    "record" is None for removed records, only their type and key are known.
+    """
+    action: str
+    record_type: type
+    key: int
+    record: typing.Optional[dict] = None
+
+
+class FingerprintStore:
+    """
+    Keeps a small fingerprint (record id => hash of the values) of each record of the last snapshot of a file,
+    so a new snapshot only yields what was inserted, changed or removed.
+
+    with FingerprintStore("fingerprints.db") as store:
+        changes = list(store.diff(FileParser(file_location).open(), scope="2016:XML"))
+        sink.apply(changes)
+    """
+
+    _connection: sqlite3.Connection = None
+
+    def __init__(self, database: str):
+        """
+        :param database: SQLite file location
+        """
+        self._connection = sqlite3.connect(database, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "scope TEXT, record_type TEXT, id INTEGER, digest BLOB, PRIMARY KEY (scope, record_type, id)"
+            ") WITHOUT ROWID"
+        )
+
+    def diff(self, records: typing.Iterable[dict], scope: str = "") -> typing.Iterator[Change]:
+        """
+        Compares the records with the previous snapshot of the same scope.
+        Only the record types present in the records are compared, so the Pedidos, Recursos and Solicitantes files
+        of a year can be diffed one by one under the same scope (a type missing from the snapshot is not removed).
+        The store is only updated after the last change is consumed, an interrupted run is compared again.
+        Records without id can not be tracked and are always yielded as inserted.
+        :param records: Iterable<Pedido|Recurso|Solicitante>, the whole snapshot of each type it contains
+        :param scope: Snapshot name, e.g. "2016:XML" (each yearly file is a different snapshot)
+        :return: Generator<Change>, the removed records come last
+        """
+        previous = self._load(scope)
+        seen = set()
+        seen_types = set()
+        updates = []
+
+        for record in records:
+            record_type = FingerprintStore._record_type(record)
+            key = to_int(record.get(record_type._key, ""))
+            seen_types.add(record_type.__name__)
+
+            if key is None:
+                yield Change(INSERTED, record_type, key, record)
+                continue
+
+            digest = FingerprintStore.fingerprint(record_type, record)
+            identity = (record_type.__name__, key)
+            known = previous.get(identity)
+            seen.add(identity)
+
+            if known == digest:
+                continue
+
+            updates.append((scope, record_type.__name__, key, digest))
+            yield Change(INSERTED if known is None else CHANGED, record_type, key, record)
+
+        names = {record_type.__name__: record_type for record_type in _RECORD_TYPES}
+        removed = [identity for identity in previous if identity[0] in seen_types and identity not in seen]
+
+        for name, key in removed:
+            yield Change(REMOVED, names[name], key)
+
+        self._save(updates, [(scope, name, key) for name, key in removed])
+
+    def clear(self, scope: str = None):
+        """
+        :param scope: Forgets this snapshot, or every snapshot when None
+        """
+        if scope is None:
+            self._connection.execute("DELETE FROM fingerprints")
+        else:
+            self._connection.execute("DELETE FROM fingerprints WHERE scope = ?", (scope,))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def fingerprint(record_type: type, record: dict) -> bytes:
+        """
+        :param record_type: Pedido, Recurso or Solicitante
+        :param record: Record
+        :return: Hash of the values, in the data dictionary order
+        """
+        values = "\x1f".join(record.get(field) or "" for field in record_type._fields)
+        return hashlib.blake2b(values.encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+    def _load(self, scope: str) -> typing.Dict[typing.Tuple[str, int], bytes]:
+        rows = self._connection.execute("SELECT record_type, id, digest FROM fingerprints WHERE scope = ?", (scope,))
+        return {(record_type, key): digest for record_type, key, digest in rows}
+
+    def _save(self, updates: typing.List[tuple], removed: typing.List[tuple]):
+        self._connection.execute("BEGIN")
+
+        try:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints (scope, record_type, id, digest) VALUES (?, ?, ?, ?)", updates
+            )
+            self._connection.executemany(
+                "DELETE FROM fingerprints WHERE scope = ? AND record_type = ? AND id = ?", removed
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _record_type(record: dict) -> type:
+        for record_type in _RECORD_TYPES:
+            if isinstance(record, record_type):
+                return record_type
+
+        raise TypeError(f"Unexpected record type: {type(record).__name__}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
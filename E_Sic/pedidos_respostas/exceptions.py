@@ -1,11 +1,23 @@
-class InvalidYear(Exception):
-    """
-    Generally used when the year is less than the year available.
-    """
-    pass
-
-class InvalidFile(Exception):
-    """
-    The file is not compatible with the expected formats.
-    """
-    pass
\ No newline at end of file
+class InvalidYear(Exception):
+    """
+    Generally used when the year is less than the year available.
+    """
+    pass
+
+class InvalidFormat(Exception):
+    """
+    The requested file format is not available in the portal.
+    """
+    pass
+
+class InvalidFile(Exception):
+    """
+    The file is not compatible with the expected formats.
+    """
+    pass
+
+class InvalidDownload(Exception):
+    """
+    The downloaded file is incomplete or corrupted.
+    """
+    pass
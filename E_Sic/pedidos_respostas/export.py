@@ -0,0 +1,165 @@
+import os, typing
+from E_Sic.pedidos_respostas.converters import to_int, to_datetimes, to_date, to_bool
+from E_Sic.pedidos_respostas.conts import _INT_FIELDS_, _DATETIME_FIELDS_, _DATE_FIELDS_, _BOOL_FIELDS_, \
+    _CATEGORICAL_FIELDS_
+from E_Sic.pedidos_respostas.types import Pedido, Recurso, Solicitante
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional, pip install E_Sic[parquet]
+    pyarrow = None
+
+# Record type => output file name
+_FILE_NAMES = (
+    (Pedido, "pedidos.parquet"),
+    (Recurso, "recursos.parquet"),
+    (Solicitante, "solicitantes.parquet"),
+)
+
+
+class ParquetExporter:
+    """
+    Writes the records from FileParser to Parquet, one file per record type, in row groups of fixed size.
+    The columns follow the data dictionary: ids as integers, dates as timestamps, "Sim"/"Não" as booleans
+    and the repetitive texts (órgão, situação, ...) dictionary encoded.
+    """
+
+    _path: str = ""
+
+    def __init__(self, path: str = ".", row_group_size: int = 100000, compression: str = "zstd"):
+        """
+        :param path: Output directory
+        :param row_group_size: Records per row group
+        :param compression: Parquet compression codec
+        """
+        if pyarrow is None:
+            raise ImportError("pyarrow is required to export Parquet files (pip install E_Sic[parquet]).")
+
+        os.makedirs(path, exist_ok=True)
+
+        self._path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self._writers = {}
+        self._buffers = {}
+
+    def write(self, records: typing.Iterable[dict]) -> int:
+        """
+        Consumes the records, flushing a row group every "row_group_size" records of the same type.
+        :param records: Iterable<Pedido|Recurso|Solicitante>
+        :return: Number of written records
+        """
+        count = 0
+
+        for record in records:
+            record_type = ParquetExporter._record_type(record)
+            buffer = self._buffers.get(record_type)
+
+            if buffer is None:
+                buffer = self._buffers[record_type] = []
+
+            buffer.append(record)
+            count += 1
+
+            if len(buffer) >= self.row_group_size:
+                self._flush(record_type)
+
+        return count
+
+    def close(self):
+        """
+        Writes what is left in the buffers and closes the files.
+        """
+        for record_type in list(self._buffers):
+            self._flush(record_type)
+
+        for writer in self._writers.values():
+            writer.close()
+
+        self._writers.clear()
+
+    def _flush(self, record_type: type):
+        records = self._buffers.get(record_type)
+
+        if not records:
+            return
+
+        schema = ParquetExporter.schema(record_type)
+        columns = []
+
+        for field in schema:
+            values = [record.get(field.name, "") for record in records]
+            columns.append(ParquetExporter._column(field, values))
+
+        table = pyarrow.Table.from_arrays(columns, schema=schema)
+        writer = self._writers.get(record_type)
+
+        if writer is None:
+            writer = self._writers[record_type] = pyarrow.parquet.ParquetWriter(
+                os.path.join(self._path, dict(_FILE_NAMES)[record_type]), schema, compression=self.compression
+            )
+
+        writer.write_table(table, row_group_size=self.row_group_size)
+        records.clear()
+
+    @staticmethod
+    def schema(record_type: type) -> "pyarrow.Schema":
+        """
+        Arrow schema of a record type
+        :param record_type: Pedido, Recurso or Solicitante
+        :return: pyarrow.Schema
+        """
+        fields = []
+
+        for name in record_type._fields:
+            if name in _INT_FIELDS_:
+                data_type = pyarrow.int64()
+            elif name in _DATETIME_FIELDS_:
+                data_type = pyarrow.timestamp("s")
+            elif name in _DATE_FIELDS_:
+                data_type = pyarrow.date32()
+            elif name in _BOOL_FIELDS_:
+                data_type = pyarrow.bool_()
+            elif name in _CATEGORICAL_FIELDS_:
+                data_type = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+            else:
+                data_type = pyarrow.string()
+
+            fields.append(pyarrow.field(name, data_type))
+
+        return pyarrow.schema(fields)
+
+    @staticmethod
+    def _column(field: "pyarrow.Field", values: typing.List[str]) -> "pyarrow.Array":
+        if pyarrow.types.is_dictionary(field.type):
+            return pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+
+        if pyarrow.types.is_integer(field.type):
+            values = [to_int(value) for value in values]
+        elif pyarrow.types.is_timestamp(field.type):
+            values = to_datetimes(values)
+        elif pyarrow.types.is_date(field.type):
+            values = [to_date(value) for value in values]
+        elif pyarrow.types.is_boolean(field.type):
+            values = [to_bool(value) for value in values]
+
+        return pyarrow.array(values, type=field.type)
+
+    @staticmethod
+    def _record_type(record: dict) -> type:
+        for record_type, file_name in _FILE_NAMES:
+            if isinstance(record, record_type):
+                return record_type
+
+        raise TypeError(f"Unexpected record type: {type(record).__name__}")
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,51 @@
+"""
+Targeted extraction of the few tags we need from the portal pages, without building a soup of the whole page.
+"""
+import html, re, typing, urllib.parse
+
+_INPUT_PATTERN = re.compile(r"<input\b[^>]*>", re.IGNORECASE)
+_ANCHOR_PATTERN = re.compile(r"<a\b([^>]*)>(.*?)</a\s*>", re.IGNORECASE | re.DOTALL)
+_ATTRIBUTE_PATTERN = re.compile(r"""([^\s=/>"']+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def attributes(tag: str) -> typing.Dict[str, str]:
+    """
+    :param tag: Tag source (or only its attributes)
+    :return: Attributes dict, names in lower case and values unescaped
+    """
+    return {
+        match.group(1).lower(): html.unescape(next(value for value in match.groups()[1:] if value is not None))
+        for match in _ATTRIBUTE_PATTERN.finditer(tag)
+    }
+
+
+def find_inputs(content: str) -> typing.Dict[str, str]:
+    """
+    Form fields (input's only) that have both name and value, like the ASP.NET hidden fields.
+    :param content: HTML Content
+    :return: Form fields dict
+    """
+    data = {}
+
+    for match in _INPUT_PATTERN.finditer(content):
+        attrs = attributes(match.group(0)[len("<input"):])
+
+        if "name" in attrs and "value" in attrs:
+            data[attrs["name"]] = attrs["value"]
+
+    return data
+
+
+def find_links(content: str, base_url: str = "") -> typing.Iterator[typing.Tuple[str, str]]:
+    """
+    :param content: HTML Content
+    :param base_url: Used to make relative links absolute
+    :return: Generator<(href, text)>
+    """
+    for match in _ANCHOR_PATTERN.finditer(content):
+        href = attributes(match.group(1)).get("href")
+
+        if href:
+            text = html.unescape(_TAG_PATTERN.sub("", match.group(2))).strip()
+            yield urllib.parse.urljoin(base_url, href), text
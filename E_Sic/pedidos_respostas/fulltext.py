@@ -0,0 +1,411 @@
+"""
+Offline full-text search over the pedidos and recursos texts, ranked with BM25.
+"""
+import array, collections, functools, heapq, math, re, sqlite3, typing, unicodedata
+from E_Sic.pedidos_respostas.converters import to_int, to_datetime
+from E_Sic.pedidos_respostas.conts import _TEXT_FIELDS_, _SEGMENT_SIZE_, _MERGE_FACTOR_
+from E_Sic.pedidos_respostas.types import Pedido, Recurso
+
+_RECORD_TYPES = (Pedido, Recurso)
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Latin letters with accents => without them ("ç" => "c"), str.translate is much faster than normalizing every text.
+_ACCENTS = {
+    code: unicodedata.normalize("NFKD", chr(code)).encode("ascii", "ignore").decode("ascii").lower() or None
+    for code in range(0xC0, 0x250) if unicodedata.category(chr(code)).startswith("L")
+}
+
+# Written without accents, like the tokens.
+_STOPWORDS = frozenset((
+    "a", "ao", "aos", "aquela", "aquelas", "aquele", "aqueles", "aquilo", "as", "ate", "com", "como", "da", "das",
+    "de", "dela", "delas", "dele", "deles", "depois", "do", "dos", "e", "ela", "elas", "ele", "eles", "em", "entre",
+    "era", "essa", "essas", "esse", "esses", "esta", "estas", "este", "estes", "eu", "foi", "for", "foram", "ha",
+    "isso", "isto", "ja", "lhe", "lhes", "mais", "mas", "me", "mesmo", "meu", "minha", "muito", "na", "nas", "nem",
+    "no", "nos", "nossa", "nosso", "num", "numa", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos", "por",
+    "qual", "quando", "que", "quem", "se", "seja", "sem", "ser", "seu", "seus", "sua", "suas", "sao", "so", "tambem",
+    "te", "tem", "ter", "um", "uma", "umas", "uns", "voce", "voces",
+))
+
+# Light Portuguese stemming: only the plural is removed ("solicitações" and "solicitação" are the same term).
+_PLURAL_SUFFIXES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("res", "r"),
+                    ("ns", "m"), ("s", ""))
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> typing.List[str]:
+    """
+    Lower case, without accents, stopwords or plural
+    :param text: Text
+    :return: List of terms
+    """
+    return [term for term in map(_term, _TOKEN_PATTERN.findall(text.lower())) if term]
+
+
+@functools.lru_cache(maxsize=256 * 1024)
+def _term(token: str) -> typing.Optional[str]:
+    """
+    Normalizes a single word, the vocabulary is small compared to the texts so the results are cached.
+    :param token: Lower case word
+    :return: Term or None for stopwords
+    """
+    token = token.translate(_ACCENTS)
+
+    if token in _STOPWORDS:
+        return None
+
+    for suffix, replacement in _PLURAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) > len(suffix) + 2:
+            if suffix != "s" or not token.endswith(("ss", "us")):
+                token = token[:-len(suffix)] + replacement
+            break
+
+    return token
+
+
+class Hit(typing.NamedTuple):
+    score: float
+    record_type: type
+    key: int
+    protocolo: str
+    orgao: str
+    year: int
+
+
+class FullTextIndex:
+    """
+    Inverted index (SQLite) of ResumoSolicitacao, DetalhamentoSolicitacao, Resposta, DescRecurso and RespostaRecurso.
+    The records are indexed while they are read, in immutable segments of "segment_size" documents,
+    and every "merge_factor" segments of the same size are merged into a bigger one (like Lucene does).
+
+    with FullTextIndex("esic_search.db") as index:
+        index.add(FileParser(file_location).open())
+        index.search("vacina covid", orgao="MS - Ministério da Saúde", year=2021)
+    """
+
+    _connection: sqlite3.Connection = None
+
+    def __init__(self, database: str, segment_size: int = _SEGMENT_SIZE_, merge_factor: int = _MERGE_FACTOR_):
+        """
+        :param database: SQLite file location
+        :param segment_size: Documents kept in memory before writing a segment
+        :param merge_factor: Number of segments of the same size merged together
+        """
+        self.segment_size = segment_size
+        self.merge_factor = merge_factor
+        self._connection = sqlite3.connect(database, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY, record_type TEXT, key INTEGER, "
+            "protocolo TEXT, orgao TEXT, year INTEGER, length INTEGER, deleted INTEGER DEFAULT 0)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_documents_key ON documents (record_type, key)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, documents INTEGER, first INTEGER)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT, segment INTEGER, data BLOB, PRIMARY KEY (term, segment)) "
+            "WITHOUT ROWID"
+        )
+
+        self._next_id = (self._connection.execute("SELECT MAX(id) FROM documents").fetchone()[0] or 0) + 1
+        self._documents = []
+        self._postings = collections.defaultdict(lambda: array.array("I"))
+        self._stats = None
+
+    def add(self, records: typing.Iterable[dict]) -> int:
+        """
+        Indexes the pedidos and recursos (other records are ignored). A record indexed again replaces the old one.
+        The documents are searchable after the segment is written (flush, close or every "segment_size" documents).
+        :param records: Iterable<Pedido|Recurso>
+        :return: Number of indexed records
+        """
+        count = 0
+
+        for record in records:
+            record_type = FullTextIndex._record_type(record)
+
+            if record_type is None:
+                continue
+
+            terms = collections.Counter()
+
+            for field in _TEXT_FIELDS_:
+                value = record.get(field)
+
+                if value:
+                    terms.update(tokenize(value))
+
+            document = self._next_id
+            self._next_id += 1
+
+            for term, frequency in terms.items():
+                postings = self._postings[term]
+                postings.append(document)
+                postings.append(frequency)
+
+            date = to_datetime(record.get("DataRegistro", ""))
+            self._documents.append((
+                document, record_type.__name__, to_int(record.get(record_type._key, "")),
+                record.get("ProtocoloPedido", ""), record.get("OrgaoDestinatario", ""), date.year if date else None,
+                sum(terms.values()),
+            ))
+            count += 1
+
+            if len(self._documents) >= self.segment_size:
+                self.flush()
+
+        return count
+
+    def remove(self, record_type: type, key: int):
+        """
+        The document stops being found at once, its postings are dropped by the next merge.
+        :param record_type: Pedido or Recurso
+        :param key: IdPedido or IdRecurso
+        """
+        self.flush()
+        self._connection.execute("UPDATE documents SET deleted = 1 WHERE record_type = ? AND key = ?",
+                                 (record_type.__name__, key))
+        self._stats = None
+
+    def flush(self):
+        """
+        Writes the documents in memory as a new segment, merging segments when needed.
+        """
+        if not self._documents:
+            return
+
+        self._connection.execute("BEGIN")
+
+        try:
+            self._connection.executemany(
+                "INSERT INTO documents (id, record_type, key, protocolo, orgao, year, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", self._documents
+            )
+            # Older versions of the same records are replaced by the new ones,
+            # after the insert so a record added twice in the same segment is also replaced.
+            self._connection.executemany(
+                "UPDATE documents SET deleted = 1 WHERE record_type = ? AND key = ? AND id < ?",
+                [(record_type, key, document) for document, record_type, key, *rest in self._documents]
+            )
+            segment = self._connection.execute(
+                "INSERT INTO segments (documents, first) VALUES (?, ?)", (len(self._documents), self._documents[0][0])
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO postings (term, segment, data) VALUES (?, ?, ?)",
+                ((term, segment, postings.tobytes()) for term, postings in self._postings.items())
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        self._documents = []
+        self._postings.clear()
+        self._stats = None
+        self._merge()
+
+    def optimize(self):
+        """
+        Merges every segment into a single one (also dropping the removed documents).
+        """
+        self.flush()
+        segments = [row[0] for row in self._connection.execute("SELECT id FROM segments")]
+
+        if len(segments) > 1 or self._connection.execute("SELECT 1 FROM documents WHERE deleted = 1").fetchone():
+            self._merge_segments(segments)
+
+    def search(self, query: str, limit: int = 10, orgao: str = None, year: int = None,
+               record_type: type = None) -> typing.List[Hit]:
+        """
+        :param query: Words to be found (same tokenization of the index)
+        :param limit: Maximum number of results
+        :param orgao: Only documents of this OrgaoDestinatario
+        :param year: Only documents registered in this year (DataRegistro)
+        :param record_type: Only Pedido or only Recurso
+        :return: List<Hit>, best first
+        """
+        stats = self._load_stats()
+        count, average, lengths, deleted = stats["count"], stats["average"], stats["lengths"], stats["deleted"]
+
+        if not count:
+            return []
+
+        orgao_code = stats["orgaos"].get(orgao, -1) if orgao is not None else None
+        type_code = stats["types"].get(record_type.__name__, -1) if record_type is not None else None
+        orgaos, years, types = stats["orgao_codes"], stats["years"], stats["type_codes"]
+        scores = collections.defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = array.array("I")
+
+            for data, in self._connection.execute("SELECT data FROM postings WHERE term = ?", (term,)):
+                postings.frombytes(data)
+
+            frequency = len(postings) // 2
+
+            if not frequency:
+                continue
+
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+            for document, term_frequency in zip(postings[0::2], postings[1::2]):
+                if document in deleted or \
+                        (orgao_code is not None and orgaos[document] != orgao_code) or \
+                        (year is not None and years[document] != year) or \
+                        (type_code is not None and types[document] != type_code):
+                    continue
+
+                norm = _K1 * (1 - _B + _B * lengths[document] / average)
+                scores[document] += idf * term_frequency * (_K1 + 1) / (term_frequency + norm)
+
+        hits = []
+
+        for document, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            name, key, protocolo, document_orgao, document_year = self._connection.execute(
+                "SELECT record_type, key, protocolo, orgao, year FROM documents WHERE id = ?", (document,)
+            ).fetchone()
+            hits.append(Hit(score, Pedido if name == "Pedido" else Recurso, key, protocolo, document_orgao,
+                            document_year))
+
+        return hits
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def _merge(self):
+        """
+        Merges "merge_factor" segments of the same tier (size order of magnitude), until no tier is full.
+        """
+        while True:
+            tiers = collections.defaultdict(list)
+
+            for segment, documents in self._connection.execute("SELECT id, documents FROM segments ORDER BY id"):
+                tier = int(math.log(max(documents / self.segment_size, 1), self.merge_factor))
+                tiers[tier].append(segment)
+
+            full = [segments for tier, segments in sorted(tiers.items()) if len(segments) >= self.merge_factor]
+
+            if not full:
+                return
+
+            self._merge_segments(full[0][:self.merge_factor])
+
+    def _merge_segments(self, segments: typing.List[int]):
+        placeholders = ", ".join("?" * len(segments))
+        deleted = set(row[0] for row in self._connection.execute("SELECT id FROM documents WHERE deleted = 1"))
+
+        self._connection.execute("BEGIN")
+
+        try:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS merged (term TEXT PRIMARY KEY, data BLOB)")
+            self._connection.execute("DELETE FROM merged")
+
+            # Each segment is a range of document ids, concatenating them in "first" order keeps the postings sorted.
+            rows = self._connection.execute(
+                f"SELECT p.term, p.data FROM postings p JOIN segments s ON s.id = p.segment "
+                f"WHERE p.segment IN ({placeholders}) ORDER BY p.term, s.first", segments
+            )
+
+            current, postings = None, array.array("I")
+            merged = []
+
+            for term, data in rows:
+                if term != current:
+                    if current is not None and postings:
+                        merged.append((current, postings.tobytes()))
+
+                    current, postings = term, array.array("I")
+
+                part = array.array("I", data)
+
+                if deleted:
+                    part = array.array("I", (value for document, frequency in zip(part[0::2], part[1::2])
+                                             if document not in deleted for value in (document, frequency)))
+
+                postings.extend(part)
+
+            if current is not None and postings:
+                merged.append((current, postings.tobytes()))
+
+            self._connection.executemany("INSERT INTO merged (term, data) VALUES (?, ?)", merged)
+
+            documents, first = self._connection.execute(
+                f"SELECT SUM(documents), MIN(first) FROM segments WHERE id IN ({placeholders})", segments
+            ).fetchone()
+            segment = self._connection.execute(
+                "INSERT INTO segments (documents, first) VALUES (?, ?)", (documents, first)
+            ).lastrowid
+            self._connection.execute(f"DELETE FROM postings WHERE segment IN ({placeholders})", segments)
+            self._connection.execute(f"DELETE FROM segments WHERE id IN ({placeholders})", segments)
+            self._connection.execute("INSERT INTO postings (term, segment, data) SELECT term, ?, data FROM merged",
+                                     (segment,))
+            self._connection.execute("DELETE FROM merged")
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _load_stats(self) -> dict:
+        """
+        Per document data used by the ranking and the filters, kept in compact arrays indexed by document id.
+        """
+        if self._stats is not None:
+            return self._stats
+
+        lengths, years, orgao_codes, type_codes = array.array("I", [0]), array.array("H", [0]), \
+            array.array("I", [0]), array.array("B", [0])
+        orgaos, types, deleted = {}, {}, set()
+        total = count = 0
+
+        rows = self._connection.execute(
+            "SELECT id, record_type, orgao, year, length, deleted FROM documents ORDER BY id"
+        )
+
+        for document, name, orgao, year, length, removed in rows:
+            # Ids are sequential, the gaps (if any) are filled as deleted documents.
+            while len(lengths) < document:
+                deleted.add(len(lengths))
+
+                for column in (lengths, years, orgao_codes, type_codes):
+                    column.append(0)
+
+            lengths.append(length)
+            years.append(year or 0)
+            orgao_codes.append(orgaos.setdefault(orgao, len(orgaos)))
+            type_codes.append(types.setdefault(name, len(types)))
+
+            if removed:
+                deleted.add(document)
+            else:
+                total += length
+                count += 1
+
+        self._stats = {
+            "count": count, "average": total / count if count else 0, "lengths": lengths, "years": years,
+            "orgao_codes": orgao_codes, "type_codes": type_codes, "orgaos": orgaos, "types": types, "deleted": deleted,
+        }
+        return self._stats
+
+    @staticmethod
+    def _record_type(record: dict) -> typing.Optional[type]:
+        for record_type in _RECORD_TYPES:
+            if isinstance(record, record_type):
+                return record_type
+
+        return None
+
+    def __len__(self) -> int:
+        return self._load_stats()["count"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
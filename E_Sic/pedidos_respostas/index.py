@@ -0,0 +1,140 @@
+import typing
+from E_Sic.pedidos_respostas.converters import to_int
+from E_Sic.pedidos_respostas.parser import FileParser
+from E_Sic.pedidos_respostas.types import Pedido, Recurso, Solicitante
+
+
+class RelationalIndex:
+    """
+    Links the Pedidos, Recursos and Solicitantes of a year (IdPedido, IdSolicitante and IdRecursoPrecedente),
+    built in a single pass over the records, every lookup is a dict access.
+    """
+
+    def __init__(self, records: typing.Iterable[dict] = ()):
+        """
+        :param records: Iterable<Pedido|Recurso|Solicitante>, in any order
+        """
+        self._pedidos = {}
+        self._recursos = {}
+        self._solicitantes = {}
+        self._recursos_by_pedido = {}
+        self._successors = {}
+        self.add(records)
+
+    @classmethod
+    def from_files(cls, *file_names: str) -> "RelationalIndex":
+        """
+        Builds the index from the files (or the zip) of a year
+        :param file_names: File locations
+        :return: RelationalIndex
+        """
+        index = cls()
+
+        for file_name in file_names:
+            with FileParser(file_name) as parser:
+                index.add(parser)
+
+        return index
+
+    def add(self, records: typing.Iterable[dict]) -> int:
+        """
+        :param records: Iterable<Pedido|Recurso|Solicitante>
+        :return: Number of indexed records
+        """
+        count = 0
+
+        for record in records:
+            if isinstance(record, Pedido):
+                self._pedidos[to_int(record.get("IdPedido", ""))] = record
+
+            elif isinstance(record, Recurso):
+                id_recurso = to_int(record.get("IdRecurso", ""))
+                self._recursos[id_recurso] = record
+                self._recursos_by_pedido.setdefault(to_int(record.get("IdPedido", "")), []).append(record)
+
+                id_precedente = to_int(record.get("IdRecursoPrecedente", ""))
+
+                if id_precedente is not None:
+                    self._successors.setdefault(id_precedente, []).append(record)
+
+            elif isinstance(record, Solicitante):
+                self._solicitantes[to_int(record.get("IdSolicitante", ""))] = record
+
+            else:
+                continue
+
+            count += 1
+
+        return count
+
+    def pedido(self, id_pedido: int) -> typing.Optional[Pedido]:
+        return self._pedidos.get(id_pedido)
+
+    def recurso(self, id_recurso: int) -> typing.Optional[Recurso]:
+        return self._recursos.get(id_recurso)
+
+    def solicitante(self, id_solicitante: int) -> typing.Optional[Solicitante]:
+        return self._solicitantes.get(id_solicitante)
+
+    def pedido_of(self, recurso: Recurso) -> typing.Optional[Pedido]:
+        """
+        :param recurso: Recurso
+        :return: Pedido to which the recurso belongs
+        """
+        return self._pedidos.get(to_int(recurso.get("IdPedido", "")))
+
+    def solicitante_of(self, record: dict) -> typing.Optional[Solicitante]:
+        """
+        :param record: Pedido or Recurso
+        :return: Who opened the pedido/recurso
+        """
+        return self._solicitantes.get(to_int(record.get("IdSolicitante", "")))
+
+    def recursos_of(self, pedido: Pedido) -> typing.List[Recurso]:
+        """
+        :param pedido: Pedido
+        :return: Every recurso of the pedido, in the file order
+        """
+        return list(self._recursos_by_pedido.get(to_int(pedido.get("IdPedido", "")), ()))
+
+    def successors(self, recurso: Recurso) -> typing.List[Recurso]:
+        """
+        :param recurso: Recurso
+        :return: Recursos whose IdRecursoPrecedente is this one
+        """
+        return list(self._successors.get(to_int(recurso.get("IdRecurso", "")), ()))
+
+    def appeal_chain(self, recurso: Recurso) -> typing.List[Recurso]:
+        """
+        Walks the IdRecursoPrecedente links back to the first instance.
+        :param recurso: Recurso
+        :return: List from the first recurso up to the informed one
+        """
+        chain = [recurso]
+        seen = {to_int(recurso.get("IdRecurso", ""))}
+        id_precedente = to_int(recurso.get("IdRecursoPrecedente", ""))
+
+        # The "seen" set protects us from broken files with circular links.
+        while id_precedente is not None and id_precedente not in seen and id_precedente in self._recursos:
+            seen.add(id_precedente)
+            precedente = self._recursos[id_precedente]
+            chain.append(precedente)
+            id_precedente = to_int(precedente.get("IdRecursoPrecedente", ""))
+
+        chain.reverse()
+        return chain
+
+    @property
+    def pedidos(self) -> typing.Dict[int, Pedido]:
+        return self._pedidos
+
+    @property
+    def recursos(self) -> typing.Dict[int, Recurso]:
+        return self._recursos
+
+    @property
+    def solicitantes(self) -> typing.Dict[int, Solicitante]:
+        return self._solicitantes
+
+    def __len__(self):
+        return len(self._pedidos) + len(self._recursos) + len(self._solicitantes)
@@ -0,0 +1,115 @@
+import hashlib, json, os, typing
+from E_Sic.pedidos_respostas.conts import _CHUNK_SIZE_
+
+_MANIFEST_NAME_ = ".esic_manifest.json"
+
+
+class ManifestEntry(typing.NamedTuple):
+    """
+    What we know about the last download of one (year, format).
+    """
+    file_name: str
+    size: int
+    last_modified: str = ""
+    etag: str = ""
+    sha256: str = ""
+    files: typing.Tuple[str, ...] = ()
+
+
+class DownloadManifest:
+    """
+    Local record of the downloaded archives, used to skip years that did not change in the portal.
+    """
+
+    _path: str = ""
+
+    def __init__(self, path: str = "."):
+        """
+        :param path: Manifest location, if it is a directory the default name is used
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, _MANIFEST_NAME_)
+
+        self._path = path
+        self._entries = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as handler:
+                for key, value in json.load(handler).items():
+                    value["files"] = tuple(value.get("files", ()))
+                    self._entries[key] = ManifestEntry(**value)
+
+    def get(self, year: int, file_format: str) -> typing.Optional[ManifestEntry]:
+        """
+        :param year: Year of the file
+        :param file_format: File format
+        :return: The last known entry, if any
+        """
+        return self._entries.get(DownloadManifest._key(year, file_format))
+
+    def set(self, year: int, file_format: str, entry: ManifestEntry):
+        """
+        Stores the entry and writes the manifest to disk
+        :param year: Year of the file
+        :param file_format: File format
+        :param entry: Download information
+        """
+        self._entries[DownloadManifest._key(year, file_format)] = entry
+        self.save()
+
+    def save(self):
+        # We write a temporary file first, a broken manifest would force a full download.
+        temporary = self._path + ".tmp"
+
+        with open(temporary, "w", encoding="utf-8") as handler:
+            json.dump({key: entry._asdict() for key, entry in self._entries.items()}, handler, indent=2)
+
+        os.replace(temporary, self._path)
+
+    @staticmethod
+    def is_unchanged(entry: ManifestEntry, file_name: str, size: typing.Optional[int], last_modified: str = "",
+                     etag: str = "") -> bool:
+        """
+        Compares the portal response with the last download.
+        Without ETag or Last-Modified nothing proves that the file is the same (a republished file may keep
+        its name and size), so it is downloaded again and compared by its sha256.
+        :param entry: Last download
+        :param file_name: File name sent in the content-disposition header
+        :param size: Content-Length
+        :param last_modified: Last-Modified header
+        :param etag: ETag header
+        :return: bool
+        """
+        if entry.file_name != file_name or size is None or entry.size != size:
+            return False
+
+        if entry.etag and etag:
+            return entry.etag == etag
+
+        if entry.last_modified and last_modified:
+            return entry.last_modified == last_modified
+
+        return False
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @staticmethod
+    def _key(year: int, file_format: str) -> str:
+        return f"{year}:{file_format.upper()}"
+
+
+def file_sha256(path: str) -> str:
+    """
+    SHA-256 of a file, read in chunks
+    :param path: File location
+    :return: Hex digest
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as handler:
+        for chunk in iter(lambda: handler.read(_CHUNK_SIZE_), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
@@ -0,0 +1,278 @@
+"""
+Instrumentation of the pipeline: stage timings (form, download, attachment, extract, parse), bytes transferred,
+records per type, retries and cache hits (form state, resolver and download manifest).
+Nothing is measured unless a Metrics instance is passed, the instrumented code only checks for None.
+"""
+import contextlib, json, os, threading, time, typing
+
+# Stages
+FORM = "form"
+DOWNLOAD = "download"
+ATTACHMENT = "attachment"
+EXTRACT = "extract"
+PARSE = "parse"
+
+COUNTER = "counter"
+TIMING = "timing"
+
+_HELP = {
+    "stage_seconds": "Time spent in each stage of the pipeline.",
+    "bytes_downloaded": "Bytes received from the portal (files and attachments).",
+    "bytes_extracted": "Bytes written while extracting the zips.",
+    "members_skipped": "Zip members already extracted (same size and CRC).",
+    "records": "Records read by FileParser, per record type.",
+    "records_per_second": "Records parsed per second of parser time, per record type.",
+    "retries": "Requests retried, per reason (status code, connection, timeout or stream).",
+    "cache": "Cache lookups, per cache (form, resolver or manifest) and result (hit or miss).",
+}
+
+
+class Sample(typing.NamedTuple):
+    """
+    One measure, handed to the callbacks as soon as it is taken.
+    """
+    kind: str
+    name: str
+    value: float
+    labels: typing.Dict[str, str]
+
+
+# Callable(sample), called from the thread that took the measure (the event loop, extraction workers, ...)
+MetricsCallback = typing.Callable[[Sample], None]
+
+
+class Metrics:
+    """
+    Collects the measures of the clients and parsers that receive it and hands each one to the callbacks.
+
+    metrics = Metrics()
+    BuscarPedidosRespostas(metrics=metrics).download_xml(2016)
+    records = list(FileParser(file_location, metrics=metrics).open())
+    metrics.save("esic.prom")  # node_exporter textfile collector, or "esic.json"
+    """
+
+    def __init__(self, callbacks: typing.Iterable[MetricsCallback] = (), prefix: str = "esic"):
+        """
+        :param callbacks: Called with each Sample
+        :param prefix: Prefix of the Prometheus metric names
+        """
+        self.callbacks = list(callbacks)
+        self.prefix = prefix
+        self.counters = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: MetricsCallback) -> MetricsCallback:
+        """
+        :param callback: Called with each Sample
+        :return: callback (usable as decorator)
+        """
+        self.callbacks.append(callback)
+        return callback
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        """
+        :param name: Counter name
+        :param value: Amount added
+        :param labels: Dimensions of the counter, e.g. record_type="Pedido"
+        """
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+        self._notify(Sample(COUNTER, name, value, labels))
+
+    def observe(self, stage: str, seconds: float, **labels: str):
+        """
+        :param stage: Stage name
+        :param seconds: Duration
+        :param labels: Dimensions of the timing
+        """
+        key = (stage, tuple(sorted(labels.items())))
+
+        with self._lock:
+            count, total, maximum = self.timings.get(key, (0, 0.0, 0.0))
+            self.timings[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+        self._notify(Sample(TIMING, stage, seconds, labels))
+
+    def cache_hit(self, cache: str):
+        """
+        :param cache: Cache name (form, resolver or manifest)
+        """
+        self.increment("cache", cache=cache, result="hit")
+
+    def cache_miss(self, cache: str):
+        """
+        :param cache: Cache name (form, resolver or manifest)
+        """
+        self.increment("cache", cache=cache, result="miss")
+
+    @contextlib.contextmanager
+    def timer(self, stage: str, **labels: str):
+        """
+        with metrics.timer("extract"): ...
+        The time is recorded even when the block fails.
+        :param stage: Stage name
+        :param labels: Dimensions of the timing
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def records(self, records: typing.Iterable[dict]) -> typing.Iterator[dict]:
+        """
+        Counts the records per type and the parser time spent on each type (the consumer time is not included).
+        The totals are recorded once, when the iteration ends or is abandoned.
+        :param records: Iterable<Pedido|Recurso|Solicitante>
+        :return: Generator with the same records
+        """
+        counts, seconds = {}, {}
+        iterator = iter(records)
+        clock = time.perf_counter
+
+        try:
+            while True:
+                start = clock()
+
+                try:
+                    record = next(iterator)
+                except StopIteration:
+                    break
+
+                name = type(record).__name__
+                seconds[name] = seconds.get(name, 0.0) + clock() - start
+                counts[name] = counts.get(name, 0) + 1
+                yield record
+        finally:
+            for name, count in counts.items():
+                self.increment("records", count, record_type=name)
+                self.observe(PARSE, seconds[name], record_type=name)
+
+    def records_per_second(self) -> typing.Dict[str, float]:
+        """
+        :return: record type => records parsed per second of parser time
+        """
+        with self._lock:
+            counts = {dict(labels)["record_type"]: value for (name, labels), value in self.counters.items()
+                      if name == "records"}
+            seconds = {dict(labels).get("record_type"): timing[1] for (name, labels), timing in self.timings.items()
+                       if name == PARSE}
+
+        return {name: count / seconds[name] for name, count in counts.items() if seconds.get(name)}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+    def to_dict(self) -> dict:
+        """
+        :return: dict(counters, timings, records_per_second), JSON serializable
+        """
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            timings = [{"stage": stage, "labels": dict(labels), "count": count, "seconds": total, "max": maximum}
+                       for (stage, labels), (count, total, maximum) in sorted(self.timings.items())]
+
+        return {"counters": counters, "timings": timings, "records_per_second": self.records_per_second()}
+
+    def to_json(self, **kwargs) -> str:
+        """
+        :param kwargs: json.dumps arguments
+        :return: JSON document
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (counters as <name>_total, stages as a summary without quantiles).
+        :return: Text, one sample per line
+        """
+        lines = []
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+
+        for name in sorted({name for (name, _), _ in counters}):
+            metric = f"{self.prefix}_{name}_total"
+            lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} counter"]
+            lines += [f"{metric}{_labels(labels)} {_number(value)}" for (other, labels), value in counters
+                      if other == name]
+
+        if timings:
+            metric = f"{self.prefix}_stage_seconds"
+            lines += [f"# HELP {metric} {_HELP['stage_seconds']}", f"# TYPE {metric} summary"]
+
+            for (stage, labels), (count, total, maximum) in timings:
+                labels = (("stage", stage),) + labels
+                lines += [f"{metric}_sum{_labels(labels)} {_number(total)}",
+                          f"{metric}_count{_labels(labels)} {count}"]
+
+            lines += [f"# HELP {metric}_max Longest run of each stage.", f"# TYPE {metric}_max gauge"]
+            lines += [f"{metric}_max{_labels((('stage', stage),) + labels)} {_number(maximum)}"
+                      for (stage, labels), (_, _, maximum) in timings]
+
+        rates = self.records_per_second()
+
+        if rates:
+            metric = f"{self.prefix}_records_per_second"
+            lines += [f"# HELP {metric} {_HELP['records_per_second']}", f"# TYPE {metric} gauge"]
+            lines += [f"{metric}{_labels((('record_type', name),))} {_number(rate)}"
+                      for name, rate in sorted(rates.items())]
+
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str):
+        """
+        Writes the metrics atomically (a scraper never reads half a file),
+        in the Prometheus text format when the extension is ".prom" and as JSON otherwise.
+        :param path: File location
+        """
+        data = self.to_prometheus() if path.endswith(".prom") else self.to_json(indent=2)
+
+        with open(path + ".tmp", "w", encoding="utf-8") as handler:
+            handler.write(data)
+
+        os.replace(path + ".tmp", path)
+
+    def _notify(self, sample: Sample):
+        for callback in self.callbacks:
+            callback(sample)
+
+
+class _Disabled:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+def timer(metrics: typing.Optional[Metrics], stage: str, **labels: str) -> typing.ContextManager:
+    """
+    Metrics.timer, or a context manager that does nothing when there are no metrics.
+    """
+    return metrics.timer(stage, **labels) if metrics is not None else _DISABLED
+
+
+def _labels(labels: typing.Iterable[tuple]) -> str:
+    labels = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{{{labels}}}" if labels else ""
+
+
+def _escape(value: typing.Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,75 +1,478 @@
-import typing, pathlib
-from bs4 import BeautifulSoup
-from E_Sic.pedidos_respostas.conts import _ALOWED_FORMAT
-from E_Sic.pedidos_respostas.exceptions import InvalidFile
-from E_Sic.pedidos_respostas.types import Pedido, Recurso,Solicitante
-
-
-
-class FileParser:
-    _file_name: str = ""
-
-    def __init__(self, file_name: str, delimiter=";"):
-        if not FileParser.is_valid_file(file_name):
-            raise InvalidFile("The file passed in is invalid for the parser.")
-
-        self._file_name = file_name
-        self.delimiter = delimiter
-
-    def open(self) -> typing.Iterator[dict]:
-
-        with open(self._file_name, "rb") as handler:
-            if pathlib.Path(self._file_name).suffix == ".xml":
-                return self._build_from_xml(contents=handler.read())
-            elif pathlib.Path(self._file_name).suffix == ".csv":
-                return self._build_from_csv(handler=handler.read())
-            else:
-                raise InvalidFile("The file passed in is invalid for the parser.")
-
-    def _build_from_csv(self, handler) -> typing.Iterator[dict]:
-        raise NotImplementedError("This method was not implemented due to several problems in the CSV file.")
-
-    def _build_from_xml(self, contents: bytes) -> typing.Iterator[dict]:
-        soup = BeautifulSoup(contents, 'xml')
-
-        if "_Pedidos_" in self._file_name:
-
-            for pedido in soup.find_all("Pedido"):
-
-                data = Pedido()
-
-                for key, value in pedido.attrs.items():
-                    data[key] = value
-
-                yield data
-
-        elif "_Recursos_" in self._file_name:
-
-            for recurso in soup.find_all("Recurso"):
-                data = Recurso()
-
-                for key, value in recurso.attrs.items():
-                    data[key] = value
-                yield data
-
-        elif "_Solicitantes_" in self._file_name:
-            for solicitante in soup.find_all("Solicitante"):
-                data = Solicitante()
-
-                for key, value in solicitante.attrs.items():
-                    data[key] = value
-
-                yield data
-        else:
-            raise InvalidFile("This method was not implemented due to several problems in the CSV file.")
-
-    @staticmethod
-    def is_valid_file(file_name) -> bool:
-        names = ("_Pedidos_" in file_name, "_Recursos_" in file_name, "_Solicitantes_" in file_name)
-        return any(names) and pathlib.Path(file_name).suffix in map(lambda t: f".{t.lower()}", _ALOWED_FORMAT)
-
-    def __enter__(self):
-        return self.open()
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+import typing, pathlib, zipfile, csv, io, codecs, re, functools, asyncio, threading, concurrent.futures, \
+    collections.abc
+from lxml import etree
+from bs4 import BeautifulSoup
+from E_Sic.pedidos_respostas.conts import _ALOWED_FORMAT, _INT_FIELDS_, _DATETIME_FIELDS_, _DATE_FIELDS_, \
+    _FREE_TEXT_FIELDS_, _CSV_FIELD_SIZE_LIMIT_, _PARSE_BATCH_SIZE_, _PARSE_QUEUE_SIZE_
+from E_Sic.pedidos_respostas.exceptions import InvalidFile
+from E_Sic.pedidos_respostas.metrics import Metrics
+from E_Sic.pedidos_respostas.types import Pedido, Recurso,Solicitante
+from E_Sic.pedidos_respostas.types.compact import COMPACT_TYPES
+
+# (file name marker, xml element, record type)
+_RECORD_TYPES = (
+    ("_Pedidos_", "Pedido", Pedido),
+    ("_Recursos_", "Recurso", Recurso),
+    ("_Solicitantes_", "Solicitante", Solicitante),
+)
+
+_DATE_PATTERN = re.compile(r"\d{1,2}/\d{1,2}/\d{4}")
+
+# Marks the end of the records in the batches queue
+_END = object()
+
+# Callable(raw record, column => text) => should the record be kept?
+RecordPredicate = typing.Callable[[typing.Mapping[str, str]], bool]
+
+
+class FileParser:
+    _file_name: str = ""
+
+    def __init__(self, file_name: str, delimiter=";", stream: bool = True, compact: bool = False,
+                 fields: typing.Iterable[str] = None, where: RecordPredicate = None, metrics: Metrics = None):
+        """
+        :param file_name: File location
+        :param delimiter: CSV delimiter
+        :param stream: Parse the XML incrementally (constant memory) instead of building the whole tree.
+        :param compact: Yields slotted records (CompactPedido, ...) with the repetitive values interned,
+                        a fraction of the memory when many records are kept.
+        :param fields: Default projection of open(), also used by "with" and "async for"
+        :param where: Default predicate of open(), also used by "with" and "async for"
+        :param metrics: Receives the records read per type and the parser time
+        """
+        if not FileParser.is_valid_file(file_name):
+            raise InvalidFile("The file passed in is invalid for the parser.")
+
+        self._file_name = file_name
+        self.delimiter = delimiter
+        self.stream = stream
+        self.compact = compact
+        self.fields = fields
+        self.where = where
+        self.metrics = metrics
+        self._interned = {}
+
+    def open(self, fields: typing.Iterable[str] = None, where: RecordPredicate = None) -> typing.Iterator[dict]:
+        """
+        Reads the records of the file.
+        The predicate runs on the raw values, before the record is built, and only the projected columns are copied:
+
+        parser.open(fields=("IdPedido", "DataRegistro"), where=lambda raw: raw.get("OrgaoDestinatario") == "ANVISA")
+
+        :param fields: Columns to keep (projection), every column when None
+        :param where: Records for which it returns False are discarded by the parser
+        :return: Generator<Pedido|Recurso|Solicitante>
+        """
+        records = self._open(fields, where)
+        return self.metrics.records(records) if self.metrics is not None else records
+
+    def _open(self, fields: typing.Iterable[str] = None, where: RecordPredicate = None) -> typing.Iterator[dict]:
+        fields = self.fields if fields is None else fields
+        where = self.where if where is None else where
+        fields = tuple(fields) if fields is not None else None
+        suffix = pathlib.Path(self._file_name).suffix.lower()
+
+        if suffix == ".zip":
+            return self._iter_zip(self._file_name, fields, where)
+
+        # The generators open (and close) the file by themselves, only when iterated.
+        if suffix == ".csv":
+            return self._iter_csv(self._file_name, fields, where)
+
+        if suffix == ".xml" and self.stream:
+            return self._iter_xml(self._file_name, self._file_name, fields, where)
+
+        with open(self._file_name, "rb") as handler:
+            if suffix == ".xml":
+                return self._build_from_xml(handler.read(), fields, where)
+            else:
+                raise InvalidFile("The file passed in is invalid for the parser.")
+
+    async def batches(self, batch_size: int = _PARSE_BATCH_SIZE_, queue_size: int = _PARSE_QUEUE_SIZE_,
+                      executor: concurrent.futures.Executor = None) -> typing.AsyncIterator[typing.List[dict]]:
+        """
+        Parses the file in a worker thread, without blocking the event loop, handing over lists of records.
+        The parser stops when "queue_size" batches are waiting to be consumed (backpressure),
+        so memory stays bounded even when the consumer is slower.
+
+        async for batch in FileParser(file_location).batches():
+            await sink.write(batch)
+
+        :param batch_size: Records per batch
+        :param queue_size: Maximum number of batches waiting to be consumed
+        :param executor: Where the parser runs, the loop default executor when None
+        :return: AsyncGenerator<List<Pedido|Recurso|Solicitante>>
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize=queue_size)
+        stopped = threading.Event()
+
+        def put(item: typing.Any):
+            # Blocks the worker while the queue is full.
+            if not stopped.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def produce():
+            try:
+                batch = []
+
+                for record in self.open():
+                    if stopped.is_set():
+                        return
+
+                    batch.append(record)
+
+                    if len(batch) >= batch_size:
+                        put(batch)
+                        batch = []
+
+                if batch:
+                    put(batch)
+
+                put(_END)
+            except Exception as error:
+                put(error)
+
+        worker = loop.run_in_executor(executor, produce)
+
+        try:
+            while True:
+                item = await queue.get()
+
+                if item is _END:
+                    break
+
+                if isinstance(item, Exception):
+                    raise item
+
+                yield item
+        finally:
+            # The consumer gave up (or failed), we release the worker and wait for it.
+            stopped.set()
+
+            while not queue.empty():
+                queue.get_nowait()
+
+            await worker
+
+    async def _iter_records(self) -> typing.AsyncIterator[dict]:
+        async for batch in self.batches():
+            for record in batch:
+                yield record
+
+    def _iter_zip(self, zip_path: str, fields: typing.Tuple[str, ...] = None,
+                  where: RecordPredicate = None) -> typing.Iterator[dict]:
+        """
+        Reads the records straight from the zip downloaded from the portal, without extracting it.
+        Each member is decompressed while it is parsed.
+        :param zip_path: Zip file location
+        :param fields: Projection
+        :param where: Predicate
+        :return: Generator<Pedido|Recurso|Solicitante>
+        """
+        with zipfile.ZipFile(zip_path, "r") as zip_obj:
+            for member in zip_obj.infolist():
+
+                if member.is_dir() or not FileParser.is_valid_file(member.filename, archive=False):
+                    continue
+
+                with zip_obj.open(member, "r") as handler:
+                    if pathlib.Path(member.filename).suffix.lower() == ".xml":
+                        yield from self._iter_xml(handler, member.filename, fields, where)
+                    else:
+                        yield from self._build_from_csv(handler, member.filename, fields, where)
+
+    def _iter_csv(self, file_name: str, fields: typing.Tuple[str, ...] = None,
+                  where: RecordPredicate = None) -> typing.Iterator[dict]:
+        with open(file_name, "rb") as handler:
+            yield from self._build_from_csv(handler, file_name, fields, where)
+
+    def _build_from_csv(self, handler: typing.BinaryIO, name: str, projection: typing.Tuple[str, ...] = None,
+                        where: RecordPredicate = None) -> typing.Iterator[dict]:
+        """
+        Streaming CSV reader (C csv module).
+        The portal files have no header and some known problems: encoding (BOM, UTF-16 or Windows-1252),
+        NUL bytes, stray quotes, line breaks and delimiters inside the text fields.
+        :param handler: Binary file object
+        :param name: File name, used to find out the record type
+        :param projection: Columns to keep
+        :param where: Predicate
+        :return: Generator<Pedido|Recurso|Solicitante>
+        """
+        tag, record_type = FileParser._record_type(name)
+        fields = record_type._fields
+        size = len(fields)
+        build = self._record_builder(record_type, projection, where)
+
+        if csv.field_size_limit() < _CSV_FIELD_SIZE_LIMIT_:
+            csv.field_size_limit(_CSV_FIELD_SIZE_LIMIT_)
+
+        text = io.TextIOWrapper(handler, encoding=FileParser._sniff_encoding(handler), errors="replace", newline="")
+        # The portal does not quote the fields: a " is text, an unmatched one must not swallow the next lines.
+        reader = csv.reader((line.replace("\0", "") for line in text), delimiter=self.delimiter,
+                            quoting=csv.QUOTE_NONE, strict=False)
+        pending = None
+
+        for row in reader:
+
+            if pending is not None:
+                if not FileParser._starts_record(row, fields):
+                    # The previous line was cut by a line break outside quotes, let's glue it back
+                    # (a delimiter in the same text makes it too long, _merge_overflow handles it below).
+                    pending[-1] = f"{pending[-1]}\n{row[0] if row else ''}"
+                    row, pending = pending + row[1:], None
+                else:
+                    record = build(zip(fields, pending))
+                    pending = None
+
+                    if record is not None:
+                        yield record
+
+            if not any(row) or list(row[:size]) == list(fields):
+                # Blank line or header
+                continue
+
+            if len(row) < size:
+                pending = row
+                continue
+
+            if len(row) > size:
+                row = FileParser._merge_overflow(row, fields, self.delimiter)
+
+            record = build(zip(fields, row))
+
+            if record is not None:
+                yield record
+
+        if pending is not None:
+            record = build(zip(fields, pending))
+
+            if record is not None:
+                yield record
+
+    @staticmethod
+    def _sniff_encoding(handler: typing.BinaryIO) -> str:
+        """
+        Finds out the encoding by the BOM or by trying to decode the beginning of the file.
+        :param handler: Binary file object (must support peek)
+        :return: Encoding name
+        """
+        sample = handler.peek(64 * 1024)[:64 * 1024] if hasattr(handler, "peek") else b""
+
+        if sample.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+
+        if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+            return "utf-16"
+
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            return "cp1252"
+
+    @staticmethod
+    def _merge_overflow(row: typing.List[str], fields: typing.Tuple[str, ...], delimiter: str) -> typing.List[str]:
+        """
+        A row with more columns than expected has a delimiter inside some text field.
+        We try to put the surplus in each free text field, keeping the first one where numbers and dates fit.
+        :param row: Broken row
+        :param fields: Expected columns
+        :param delimiter: CSV delimiter
+        :return: Row with the expected size
+        """
+        surplus = len(row) - len(fields)
+        candidates = [fields.index(field) for field in _FREE_TEXT_FIELDS_ if field in fields]
+        merged = None
+
+        for index in candidates:
+            merged = row[:index] + [delimiter.join(row[index:index + surplus + 1])] + row[index + surplus + 1:]
+
+            if all(FileParser._looks_valid(field, value) for field, value in zip(fields, merged)):
+                return merged
+
+        if merged is None:
+            # No free text field, the surplus is dropped.
+            return row[:len(fields)]
+
+        return row[:candidates[0]] + [delimiter.join(row[candidates[0]:candidates[0] + surplus + 1])] + \
+            row[candidates[0] + surplus + 1:]
+
+    @staticmethod
+    def _starts_record(row: typing.List[str], fields: typing.Tuple[str, ...]) -> bool:
+        """
+        Does the line start a new record, or is it the rest of a text cut by a line break?
+        Records start with their numeric id followed by other columns.
+        :param row: Line read by the csv reader
+        :param fields: Expected columns
+        :return: bool
+        """
+        if len(row) < 2 or not row[0].strip().isdigit():
+            return False
+
+        return all(FileParser._looks_valid(field, value) for field, value in zip(fields[1:3], row[1:3]))
+
+    @staticmethod
+    def _looks_valid(field: str, value: str) -> bool:
+        value = value.strip()
+
+        if not value:
+            return True
+
+        if field in _INT_FIELDS_:
+            return value.isdigit()
+
+        if field in _DATETIME_FIELDS_ or field in _DATE_FIELDS_:
+            return _DATE_PATTERN.match(value) is not None
+
+        return True
+
+    def _iter_xml(self, source: typing.Union[str, typing.BinaryIO], name: str, fields: typing.Tuple[str, ...] = None,
+                  where: RecordPredicate = None) -> typing.Iterator[dict]:
+        """
+        Incremental XML parser, each record is yielded as soon as its element is closed
+        and then discarded, so memory does not grow with the file size.
+        The portal files carry invalid characters (e.g. \x0b inside a Resposta), like bs4 the parser recovers from them
+        instead of losing the whole file.
+        :param source: File location or binary file object
+        :param name: File name, used to find out the record type
+        :param fields: Projection
+        :param where: Predicate
+        :return: Generator<Pedido|Recurso|Solicitante>
+        """
+        tag, record_type = FileParser._record_type(name)
+        build = self._record_builder(record_type, fields, where)
+        parents = []
+
+        for event, element in etree.iterparse(source, events=("start", "end"), recover=True, huge_tree=True):
+
+            if event == "start":
+                parents.append(element)
+                continue
+
+            parents.pop()
+
+            # Ignores the namespace, just like bs4 does.
+            if element.tag == tag or element.tag.endswith("}" + tag):
+                data = build(element.attrib)
+
+                # Records only have attributes, we can drop everything already read.
+                if parents:
+                    del parents[-1][:]
+                else:
+                    element.clear()
+
+                if data is not None:
+                    yield data
+
+    def _build_from_xml(self, contents: bytes, fields: typing.Tuple[str, ...] = None,
+                        where: RecordPredicate = None) -> typing.Iterator[dict]:
+        soup = BeautifulSoup(contents, 'xml')
+
+        if "_Pedidos_" in self._file_name:
+            build = self._record_builder(Pedido, fields, where)
+
+            for pedido in soup.find_all("Pedido"):
+                data = build(pedido.attrs)
+
+                if data is not None:
+                    yield data
+
+        elif "_Recursos_" in self._file_name:
+            build = self._record_builder(Recurso, fields, where)
+
+            for recurso in soup.find_all("Recurso"):
+                data = build(recurso.attrs)
+
+                if data is not None:
+                    yield data
+
+        elif "_Solicitantes_" in self._file_name:
+            build = self._record_builder(Solicitante, fields, where)
+
+            for solicitante in soup.find_all("Solicitante"):
+                data = build(solicitante.attrs)
+
+                if data is not None:
+                    yield data
+        else:
+            raise InvalidFile("This method was not implemented due to several problems in the CSV file.")
+
+    def _record_factory(self, record_type: type) -> typing.Callable[[typing.Any], dict]:
+        """
+        :param record_type: Pedido, Recurso or Solicitante
+        :return: Callable that builds the record from a mapping or pairs, compact or not
+        """
+        if not self.compact:
+            return record_type
+
+        return functools.partial(COMPACT_TYPES[record_type], interned=self._interned)
+
+    def _record_builder(self, record_type: type, fields: typing.Tuple[str, ...] = None,
+                        where: RecordPredicate = None) -> typing.Callable[[typing.Any], typing.Optional[dict]]:
+        """
+        :param record_type: Pedido, Recurso or Solicitante
+        :param fields: Columns to keep, every column when None
+        :param where: Predicate on the raw values
+        :return: Callable that builds the record from a mapping or pairs, None when the predicate rejects it
+        """
+        factory = self._record_factory(record_type)
+
+        if fields is None and where is None:
+            return factory
+
+        def build(values: typing.Union[typing.Mapping[str, str], typing.Iterable[tuple]]) -> typing.Optional[dict]:
+            if not isinstance(values, collections.abc.Mapping):
+                values = dict(values)
+
+            if where is not None and not where(values):
+                return None
+
+            if fields is not None:
+                # Only the requested columns are copied to the record.
+                values = {field: values[field] for field in fields if field in values}
+
+            return factory(values)
+
+        return build
+
+    @staticmethod
+    def _record_type(file_name: str) -> typing.Tuple[str, type]:
+        """
+        Finds the XML element and record type based on the file name
+        :param file_name: File name
+        :return: tuple(element name, record type)
+        """
+        for marker, tag, record_type in _RECORD_TYPES:
+            if marker in file_name:
+                return tag, record_type
+
+        raise InvalidFile("The file passed in is invalid for the parser.")
+
+    @staticmethod
+    def is_valid_file(file_name, archive: bool = True) -> bool:
+        """
+        :param file_name: File name
+        :param archive: Also accepts the zip downloaded from the portal
+        :return: bool
+        """
+        suffix = pathlib.Path(file_name).suffix.lower()
+
+        if archive and suffix == ".zip":
+            return True
+
+        names = ("_Pedidos_" in file_name, "_Recursos_" in file_name, "_Solicitantes_" in file_name)
+        return any(names) and suffix in map(lambda t: f".{t.lower()}", _ALOWED_FORMAT)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def __aiter__(self) -> typing.AsyncIterator[dict]:
+        """
+        async for record in FileParser(file_location): ...
+        The file is parsed in a worker thread, see batches().
+        """
+        return self._iter_records()
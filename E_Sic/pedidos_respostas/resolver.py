@@ -0,0 +1,356 @@
+import asyncio, aiohttp, json, re, sqlite3, time, typing, urllib.parse, requests
+from xml.sax.saxutils import escape
+from E_Sic.pedidos_respostas.conts import _PROCESS_QUERY_URL, _XML_REQUEST_TEMPLATE, _XML_REQUEST_SAMPLE_NUP, \
+    _SEARCH_REQUEST_PROTOCOL, _ENCODING_, _RESOLVER_CACHE_TTL_
+from E_Sic.pedidos_respostas.forms import find_inputs, find_links
+from E_Sic.pedidos_respostas.metrics import Metrics
+
+_DIGEST_FIELD = "__REQUESTDIGEST"
+
+# Callable(method, url, **aiohttp request arguments) => awaitable response
+RequestFunction = typing.Callable[..., typing.Awaitable[aiohttp.ClientResponse]]
+_ITEM_URL_PATTERN = re.compile(r"ID=\d+")
+
+
+class Resolved(typing.NamedTuple):
+    """
+    Item page and attachments of a protocol.
+    """
+    url: str
+    attachments: typing.FrozenSet[tuple]
+
+
+def search_url(protocolo: str) -> str:
+    """
+    :param protocolo: Protocol number (NUP)
+    :return: Portal search URL
+    """
+    return f"{_SEARCH_REQUEST_PROTOCOL}{urllib.parse.quote(f'NUP={protocolo}')}"
+
+
+def process_query_body(protocolo: str) -> str:
+    """
+    :param protocolo: Protocol number (NUP)
+    :return: ProcessQuery request (the same the search page sends)
+    """
+    return _XML_REQUEST_TEMPLATE.replace(_XML_REQUEST_SAMPLE_NUP, escape(protocolo))
+
+
+def process_query_headers(digest: str) -> typing.Dict[str, str]:
+    return {
+        "Content-Type": "text/xml",
+        "X-RequestDigest": digest,
+        "X-Requested-With": "XMLHttpRequest",
+    }
+
+
+def find_digest(content: str) -> str:
+    """
+    :param content: HTML of any portal page
+    :return: SharePoint form digest, required by ProcessQuery
+    """
+    return find_inputs(content).get(_DIGEST_FIELD, "")
+
+
+def parse_process_query(payload: typing.Union[str, bytes]) -> str:
+    """
+    Finds the item page among the search results.
+    :param payload: ProcessQuery JSON response
+    :return: Direct url to the item page ("" if not found)
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode(_ENCODING_)
+
+    pending = [json.loads(payload)]
+
+    # The result tables are deep inside the response, we look for the first "Path" pointing to an item.
+    while pending:
+        node = pending.pop()
+
+        if isinstance(node, dict):
+            # Rows come as {"Path": ...} (ResultRows) or as {"Key": "Path", "Value": ...} (Cells).
+            path = node.get("Value") if node.get("Key") == "Path" else node.get("Path")
+
+            if isinstance(path, str) and _ITEM_URL_PATTERN.search(path):
+                return path
+
+            pending.extend(reversed(list(node.values())))
+
+        elif isinstance(node, list):
+            pending.extend(reversed(node))
+
+    return ""
+
+
+def parse_attachments(content: str, base_url: str) -> typing.Set[tuple]:
+    """
+    :param content: HTML of the item page
+    :param base_url: Item page url
+    :return: Set( file_url, file_name )
+    """
+    return {(url, text) for url, text in find_links(content, base_url) if "Attachments" in url and text}
+
+
+class Resolver:
+    """
+    Finds the item page and the attachments of a protocol with plain HTTP requests (no browser).
+    """
+
+    _session: requests.Session = None
+
+    def __init__(self, session: requests.Session = None, timeout: float = 30):
+        """
+        :param session: requests session, a new one is created if not informed
+        :param timeout: Timeout of each request (seconds)
+        """
+        self._session = session or requests.Session()
+        self._digest = ""
+        self.timeout = timeout
+
+    def url(self, protocolo: str) -> str:
+        """
+        :param protocolo: Protocol number (NUP)
+        :return: Direct url to the item page ("" if not found)
+        """
+        if not self._digest:
+            self._digest = self._get_digest(protocolo)
+
+        response = self._post_query(protocolo)
+
+        if response.status_code == 403:
+            # The digest expires after a while.
+            self._digest = self._get_digest(protocolo)
+            response = self._post_query(protocolo)
+
+        response.raise_for_status()
+        return parse_process_query(response.content)
+
+    def attachments(self, url: str) -> typing.Set[tuple]:
+        """
+        :param url: Item page url
+        :return: Set( file_url, file_name )
+        """
+        if not url:
+            return set()
+
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_attachments(response.text, url)
+
+    def _get_digest(self, protocolo: str) -> str:
+        response = self._session.get(search_url(protocolo), timeout=self.timeout)
+        response.raise_for_status()
+        return find_digest(response.text)
+
+    def _post_query(self, protocolo: str) -> requests.Response:
+        return self._session.post(_PROCESS_QUERY_URL, data=process_query_body(protocolo).encode(_ENCODING_),
+                                  headers=process_query_headers(self._digest), timeout=self.timeout)
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+
+class ResolverCache:
+    """
+    On-disk (SQLite) cache of resolved protocols, entries older than "ttl" seconds are ignored.
+    """
+
+    _connection: sqlite3.Connection = None
+
+    def __init__(self, database: str, ttl: float = _RESOLVER_CACHE_TTL_):
+        """
+        :param database: SQLite file location
+        :param ttl: Entry lifetime (seconds)
+        """
+        self.ttl = ttl
+        self._connection = sqlite3.connect(database, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS resolved ("
+            "ProtocoloPedido TEXT PRIMARY KEY, url TEXT, attachments TEXT, resolved_at REAL)"
+        )
+
+    def get(self, protocolo: str) -> typing.Optional[Resolved]:
+        row = self._connection.execute(
+            "SELECT url, attachments FROM resolved WHERE ProtocoloPedido = ? AND resolved_at >= ?",
+            (protocolo, time.time() - self.ttl)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return Resolved(row[0], frozenset(tuple(item) for item in json.loads(row[1])))
+
+    def set(self, protocolo: str, resolved: Resolved):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO resolved (ProtocoloPedido, url, attachments, resolved_at) VALUES (?, ?, ?, ?)",
+            (protocolo, resolved.url, json.dumps(sorted(resolved.attachments)), time.time())
+        )
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncResolver:
+    """
+    Resolves the item page and attachments of many records at once, on an aiohttp session,
+    at most "concurrency" protocols at a time. Protocols shared by several records (a pedido and its recursos)
+    are resolved once and, with a cache, repeated runs only touch the new protocols.
+    """
+
+    _client: aiohttp.ClientSession = None
+
+    def __init__(self, client: aiohttp.ClientSession, cache: ResolverCache = None, concurrency: int = 10,
+                 request: RequestFunction = None, metrics: Metrics = None):
+        """
+        :param client: aiohttp session
+        :param cache: Optional on-disk cache
+        :param concurrency: Maximum number of protocols being resolved at the same time
+        :param request: Sends the requests, e.g. AsyncBuscarPedidosRespostas._request (retries and backoff),
+                        a plain client.request when None
+        :param metrics: Receives the cache hits and misses
+        """
+        self._client = client
+        self._request = request or (lambda method, url, **kwargs: self._client.request(method, url, **kwargs))
+        self._digest = ""
+        self._digest_lock = asyncio.Lock()
+        self.cache = cache
+        self.concurrency = concurrency
+        self.metrics = metrics
+
+    async def resolve(self, records: typing.Iterable[dict]) -> typing.Dict[str, Resolved]:
+        """
+        :param records: Iterable<Pedido|Recurso>
+        :return: dict(ProtocoloPedido => Resolved), records that failed are left out
+        """
+        by_protocol = {}
+
+        for record in records:
+            protocolo = record.get("ProtocoloPedido", "")
+
+            if protocolo:
+                by_protocol.setdefault(protocolo, []).append(record)
+
+        results = {}
+        pending = []
+
+        for protocolo in by_protocol:
+            cached = self.cache.get(protocolo) if self.cache is not None else None
+
+            if self.cache is not None and self.metrics is not None:
+                (self.metrics.cache_miss if cached is None else self.metrics.cache_hit)("resolver")
+
+            if cached is None:
+                pending.append(protocolo)
+            else:
+                results[protocolo] = cached
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(protocolo: str):
+            async with semaphore:
+                try:
+                    return protocolo, await self.resolve_one(protocolo)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    return protocolo, None
+
+        for future in asyncio.as_completed([worker(protocolo) for protocolo in pending]):
+            protocolo, resolved = await future
+
+            if resolved is None:
+                continue
+
+            results[protocolo] = resolved
+
+            # A protocol the search does not find yet (not indexed) is asked again in the next run.
+            if self.cache is not None and resolved.url:
+                self.cache.set(protocolo, resolved)
+
+        # Saves a request when someone reads record.url later.
+        for protocolo, resolved in results.items():
+            for record in by_protocol[protocolo]:
+                record._direct_url = resolved.url
+
+        return results
+
+    async def resolve_one(self, protocolo: str) -> Resolved:
+        """
+        :param protocolo: Protocol number (NUP)
+        :return: Resolved
+        """
+        url = await self.url(protocolo)
+        return Resolved(url, frozenset(await self.attachments(url)))
+
+    async def url(self, protocolo: str) -> str:
+        """
+        :param protocolo: Protocol number (NUP)
+        :return: Direct url to the item page ("" if not found)
+        """
+        digest = await self._get_digest(protocolo)
+        status, payload = await self._post_query(protocolo, digest)
+
+        if status == 403:
+            # The digest expires after a while.
+            digest = await self._get_digest(protocolo, expired=digest)
+            status, payload = await self._post_query(protocolo, digest)
+
+        if status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=status, message="ProcessQuery failed")
+
+        return parse_process_query(payload)
+
+    async def attachments(self, url: str) -> typing.Set[tuple]:
+        """
+        :param url: Item page url
+        :return: Set( file_url, file_name )
+        """
+        if not url:
+            return set()
+
+        async with await self._request("GET", url) as response:
+            response.raise_for_status()
+            return parse_attachments(await response.text(), url)
+
+    async def _get_digest(self, protocolo: str, expired: str = "") -> str:
+        async with self._digest_lock:
+            # Only the first coroutine (or the first one after it expired) fetches a new digest.
+            if not self._digest or self._digest == expired:
+                async with await self._request("GET", search_url(protocolo)) as response:
+                    response.raise_for_status()
+                    self._digest = find_digest(await response.text())
+
+            return self._digest
+
+    async def _post_query(self, protocolo: str, digest: str) -> typing.Tuple[int, bytes]:
+        async with await self._request("POST", _PROCESS_QUERY_URL,
+                                       data=process_query_body(protocolo).encode(_ENCODING_),
+                                       headers=process_query_headers(digest)) as response:
+            return response.status, await response.read()
+
+    @property
+    def client(self) -> aiohttp.ClientSession:
+        return self._client
+
+
+_default_resolver = None
+
+
+def default_resolver() -> Resolver:
+    """
+    :return: Resolver shared by the record properties (keeps the connection and the digest)
+    """
+    global _default_resolver
+
+    if _default_resolver is None:
+        _default_resolver = Resolver()
+
+    return _default_resolver
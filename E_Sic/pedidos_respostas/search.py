@@ -1,29 +1,92 @@
-import asyncio, aiohttp, atexit, aiofile, re, os, typing, glob, zipfile
-from bs4 import BeautifulSoup
-from E_Sic.pedidos_respostas.exceptions import InvalidYear
-from E_Sic.pedidos_respostas.conts import _ENCODING_, _URL_, _SELECT_FORMAT_, _SELECT_YEAR_, _MIN_YEAR
+import asyncio, aiohttp, atexit, aiofile, re, os, typing, zipfile, functools, random, threading, zlib, time, \
+    concurrent.futures
+from E_Sic.pedidos_respostas.forms import find_inputs
+from E_Sic.pedidos_respostas.manifest import DownloadManifest, ManifestEntry, file_sha256
+from E_Sic.pedidos_respostas.resolver import AsyncResolver, ResolverCache, Resolved
+from E_Sic.pedidos_respostas.attachments import AttachmentStore
+from E_Sic.pedidos_respostas.exceptions import InvalidYear, InvalidDownload, InvalidFormat
+from E_Sic.pedidos_respostas.metrics import Metrics, timer, FORM, DOWNLOAD, ATTACHMENT, EXTRACT
+from E_Sic.pedidos_respostas.conts import _ENCODING_, _URL_, _SELECT_FORMAT_, _SELECT_YEAR_, _MIN_YEAR, _CHUNK_SIZE_, \
+    _DOWNLOAD_RETRIES_, _ALOWED_FORMAT, _RESOLVER_CACHE_TTL_, _RETRY_STATUS_, _BACKOFF_BASE_, _BACKOFF_MAX_, \
+    _CONNECT_TIMEOUT_, _READ_TIMEOUT_, _EXTRACT_WORKERS_, _FORM_STATE_TTL_, _VALIDATOR_SUFFIX_
+
+# Callable(downloaded bytes, total bytes or None)
+ProgressCallback = typing.Callable[[int, typing.Optional[int]], None]
+
+# Callable(zip member name) => should it be extracted?
+MemberFilter = typing.Callable[[str], bool]
+
+
+class DownloadResult(typing.NamedTuple):
+    """
+    Result of one (year, format) of a batch download, when something went wrong "error" is filled and "files" is empty.
+    """
+    year: int
+    file_format: str
+    files: typing.List[str]
+    error: typing.Optional[Exception] = None
 
 
-class BuscarPedidosRespostas:
+class AsyncBuscarPedidosRespostas:
 
     """
-    Class used to facilitate the search process within the portal
-    In this class I used and abused async, maybe it was a bad thing, in the future I will add a sync version.
+    Async version of BuscarPedidosRespostas, to be used inside an existing event loop (aiohttp services, etc.)
+
+    async with AsyncBuscarPedidosRespostas() as instance:
+        files = await instance.download_xml(2016)
+
+    The session is created on the first request, inside the running loop, and closed by close() (or "async with").
     """
 
-    _loop: asyncio.AbstractEventLoop = None
     _client: aiohttp.ClientSession = None
+    _form_lock: asyncio.Lock = None
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 30,
+                 ttl_dns_cache: int = 300, timeout: aiohttp.ClientTimeout = None, retries: int = _DOWNLOAD_RETRIES_,
+                 backoff: float = _BACKOFF_BASE_, max_backoff: float = _BACKOFF_MAX_, url: str = _URL_,
+                 metrics: Metrics = None):
+        """
+        :param limit: Maximum number of open connections
+        :param limit_per_host: Maximum number of open connections to the same host
+        :param keepalive_timeout: Seconds an idle connection is kept open
+        :param ttl_dns_cache: Seconds a DNS answer is reused
+        :param timeout: aiohttp timeouts, by default only connect and read (between chunks) are limited,
+                        since a yearly file may take long to download
+        :param retries: How many times a request is retried (connection errors, timeouts, 429 and 5xx)
+        :param backoff: Base delay of the exponential backoff (seconds)
+        :param max_backoff: Maximum delay between retries (seconds)
+        :param url: DownloadDados.aspx location (a mirror or a local stand-in, e.g. the benchmarks portal)
+        :param metrics: Receives the stage timings, transferred bytes, retries and cache hits
+        """
+        self.url = url
+        self.metrics = metrics
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        if timeout is None:
+            timeout = aiohttp.ClientTimeout(total=None, connect=_CONNECT_TIMEOUT_, sock_connect=_CONNECT_TIMEOUT_,
+                                            sock_read=_READ_TIMEOUT_)
+
+        self._timeout = timeout
+        self._form_fields = {}
+        self._connector_options = dict(limit=limit, limit_per_host=limit_per_host,
+                                       keepalive_timeout=keepalive_timeout, ttl_dns_cache=ttl_dns_cache)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
 
-    def __init__(self):
-        self._loop = asyncio.get_event_loop()
-        self._client = aiohttp.ClientSession(loop=self.loop)
-        atexit.register(self._close_connection_)
+    async def __aenter__(self):
+        return self
 
-    def _close_connection_(self):
-        self.loop.run_until_complete(self.client.close())
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
-    async def _download(self, year: int = 2016, file_format: str = "", path: str = ".", delete: bool = False) -> \
-            typing.Iterator[str]:
+    async def _download(self, year: int = 2016, file_format: str = "", path: str = ".", delete: bool = False,
+                        progress: ProgressCallback = None, manifest: DownloadManifest = None,
+                        extract: bool = True, members: MemberFilter = None) -> typing.Iterator[str]:
 
         """
         Method for downloading data in the year and specified format.
@@ -31,81 +94,302 @@ class BuscarPedidosRespostas:
         :param file_format: Desired file format
         :param path: Place to be saved
         :param delete:  Should we delete the zip?
+        :param progress: Called after each downloaded chunk with (downloaded bytes, total bytes or None)
+        :param manifest: When informed, years that did not change since the last download are skipped
+        :param extract: When False the zip is not extracted and its location is returned (FileParser reads zips)
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
         :return: Generator<str>
         """
 
         if year < _MIN_YEAR:
             raise InvalidYear(f"The requested year ({year}) is far below the minimum ({_MIN_YEAR}).")
 
-        # We need to retrieve the form fields to send the post.
-        data = await self._get_url_submit_fields(_URL_)
-
-        # Now, we need to inform the year and type of file we want.
-        data[_SELECT_YEAR_] = year
-        data[_SELECT_FORMAT_] = file_format
-
-        # Vualá, now just download
-        file_name = await self._download_file_post(_URL_, data, path)
-
-        # Let's extract the zip
         zip_output = os.path.join(path, f"download_{file_format.lower()}")
-        output_files = await self._uncronpress_zip(file_name, zip_output)
+        known = manifest.get(year, file_format) if manifest is not None else None
+        wanted = list(known.files) if known else []
+
+        if known and extract and members is not None:
+            # Only the members asked by the caller need to be there.
+            wanted = [name for name in wanted if members(os.path.relpath(name, zip_output).replace(os.sep, "/"))]
+
+        # The manifest is useless if someone removed the extracted files (or asked for the other mode).
+        if known and not (wanted and all(map(os.path.exists, wanted))):
+            known = None
+        elif known and any(name.endswith(".zip") for name in known.files) == extract:
+            known = None
+
+        # We need the form fields to send the post, they are reused by the next downloads of this session.
+        fields = await self._get_url_submit_fields(self.url)
+
+        with timer(self.metrics, DOWNLOAD, file_format=file_format.upper()):
+            try:
+                # Vualá, now just download
+                file_name, remote = await self._download_file_post(
+                    self.url, self._form_data(fields, year, file_format), path, progress, known
+                )
+            except (InvalidDownload, aiohttp.ClientResponseError):
+                # The portal rejects an expired form state (error page instead of the file), a fresh one is tried once.
+                self._invalidate_submit_fields(self.url, fields)
+                fields = await self._get_url_submit_fields(self.url)
+                file_name, remote = await self._download_file_post(
+                    self.url, self._form_data(fields, year, file_format), path, progress, known
+                )
+
+        if manifest is not None and self.metrics is not None:
+            (self.metrics.cache_miss if file_name else self.metrics.cache_hit)("manifest")
+
+        if file_name is None:
+            # Nothing changed in the portal.
+            return iter(wanted)
+
+        sha256 = await asyncio.get_event_loop().run_in_executor(None, file_sha256, file_name) \
+            if manifest is not None else None
+
+        if not extract:
+            # FileParser reads the records straight from the zip.
+            files = recorded = [file_name]
+        elif known and known.sha256 == sha256:
+            # Same content under new headers, the extracted files are still good.
+            files, recorded = wanted, known.files
+        else:
+            # Let's extract the zip
+            files = [name for name in await self._uncronpress_zip(file_name, zip_output, members)
+                     if name.lower().endswith(f".{file_format.lower()}")]
+
+            # Every member is recorded, a later call with another filter knows what should be there.
+            recorded = self._zip_members(file_name, zip_output, file_format) if manifest is not None else files
+
+        if manifest is not None:
+            manifest.set(year, file_format, remote._replace(sha256=sha256, files=tuple(recorded)))
 
         # If you need, we delete the zip.
-        if delete:
+        if delete and extract:
             os.remove(file_name)
 
-        # Now, we return the extracted files to a generator, using iglob.
-        return glob.iglob(os.path.join(output_files, f"*.{file_format.lower()}"))
+        return iter(files)
 
-    def download_csv(self, year: int = 2016, path: str = ".", delete_zip: bool = False) -> typing.Iterator[str]:
+    async def download_csv(self, year: int = 2016, path: str = ".", delete_zip: bool = False,
+                           progress: ProgressCallback = None, manifest: DownloadManifest = None,
+                           extract: bool = True, members: MemberFilter = None) -> typing.Iterator[str]:
         """
         Download CSV files
 
         :param year: Year of the desired file
         :param path: Place to be saved
         :param delete_zip: Should we delete the zip?
+        :param progress: Called after each downloaded chunk with (downloaded bytes, total bytes or None)
+        :param manifest: When informed, skips the download if the file did not change
+        :param extract: When False, returns the zip location instead of extracting it (FileParser reads zips)
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
         :return: Generator<str>
         """
 
-        return self.loop.run_until_complete(self._download(
-            year,
-            "CSV",
-            path,
-            delete_zip
-        ))
+        return await self._download(year, "CSV", path, delete_zip, progress, manifest, extract, members)
 
-    def download_xml(self, year: int = 2016, path: str = ".", delete_zip: bool = False) -> typing.Iterator[str]:
+    async def download_xml(self, year: int = 2016, path: str = ".", delete_zip: bool = False,
+                           progress: ProgressCallback = None, manifest: DownloadManifest = None,
+                           extract: bool = True, members: MemberFilter = None) -> typing.Iterator[str]:
         """
         Download the XML files
         :param year: Year of the desired file
         :param path: Place to be saved
         :param delete_zip: Should we delete the zip?
+        :param progress: Called after each downloaded chunk with (downloaded bytes, total bytes or None)
+        :param manifest: When informed, skips the download if the file did not change
+        :param extract: When False, returns the zip location instead of extracting it (FileParser reads zips)
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
         :return: Generator<str>
         """
-        return self.loop.run_until_complete(self._download(
-            year,
-            "XML",
-            path,
-            delete_zip
-        ))
+        return await self._download(year, "XML", path, delete_zip, progress, manifest, extract, members)
+
+    async def download_many(self, years: typing.Iterable[int], formats: typing.Iterable[str] = ("XML",),
+                            path: str = ".", delete_zip: bool = False, concurrency: int = 2,
+                            progress: typing.Callable[[int, str, int, typing.Optional[int]], None] = None,
+                            manifest: DownloadManifest = None, extract: bool = True,
+                            members: MemberFilter = None) -> \
+            typing.AsyncIterator[DownloadResult]:
+        """
+        Downloads every (year, format) combination on the same session, at most "concurrency" at a time.
+        :param years: Desired years
+        :param formats: Desired formats (CSV and/or XML)
+        :param path: Place to be saved
+        :param delete_zip: Should we delete the zips?
+        :param concurrency: Maximum number of simultaneous downloads
+        :param progress: Called after each downloaded chunk with (year, format, downloaded bytes, total bytes or None)
+        :param manifest: When informed, years that did not change since the last download are skipped
+        :param extract: When False, the zip locations are returned instead of the extracted files
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
+        :return: AsyncGenerator<DownloadResult>, in the order they finish
+        """
+        formats = sorted(set(file_format.upper() for file_format in formats))
+
+        for file_format in formats:
+            if file_format not in _ALOWED_FORMAT:
+                raise InvalidFormat(f"The requested format ({file_format}) is not one of {sorted(_ALOWED_FORMAT)}.")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def worker(year: int, file_format: str) -> DownloadResult:
+            async with semaphore:
+                try:
+                    files = await self._download(year, file_format, path, delete_zip,
+                                                 functools.partial(progress, year, file_format) if progress else None,
+                                                 manifest, extract, members)
+                    return DownloadResult(year, file_format, list(files))
+                except Exception as error:
+                    return DownloadResult(year, file_format, [], error)
+
+        tasks = [asyncio.ensure_future(worker(year, file_format))
+                 for year in sorted(set(years)) for file_format in formats]
+
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            # The caller gave up in the middle, there is no reason to keep downloading.
+            for task in tasks:
+                task.cancel()
+
+    async def resolve_attachments(self, records: typing.Iterable[dict], cache: str = None,
+                                  ttl: float = _RESOLVER_CACHE_TTL_,
+                                  concurrency: int = 10) -> typing.Dict[str, Resolved]:
+        """
+        Finds the item page and the attachments of many Pedidos/Recursos at once, on this session.
 
-    async def _uncronpress_zip(self, zip_path: str, output: str) -> str:
+        :param records: Iterable<Pedido|Recurso>
+        :param cache: SQLite file used to keep the results between runs (keyed by ProtocoloPedido)
+        :param ttl: Lifetime of the cached results (seconds)
+        :param concurrency: Maximum number of protocols being resolved at the same time
+        :return: dict(ProtocoloPedido => Resolved(url, attachments))
+        """
+        resolver_cache = ResolverCache(cache, ttl) if cache else None
+
+        try:
+            return await AsyncResolver(self.client, resolver_cache, concurrency, self._request,
+                                       self.metrics).resolve(records)
+        finally:
+            if resolver_cache is not None:
+                resolver_cache.close()
+
+    async def _download_attachments(self, attachments: typing.Mapping[str, typing.Iterable[tuple]],
+                                    store: AttachmentStore, concurrency: int = 8) -> typing.Dict[str, typing.List[dict]]:
+        """
+        Downloads every attachment once (the same file is usually attached to many pedidos) into the store.
+        :param attachments: dict(ProtocoloPedido => Iterable( file_url, file_name ))
+        :param store: Content addressed storage
+        :param concurrency: Maximum number of simultaneous downloads
+        :return: dict(ProtocoloPedido => list of stored files)
+        """
+        attachments = {protocolo: list(files) for protocolo, files in attachments.items()}
+        urls = set(url for files in attachments.values() for url, name in files)
+        semaphore = asyncio.Semaphore(concurrency)
+        errors = {}
+
+        async def worker(url: str):
+            async with semaphore:
+                try:
+                    with timer(self.metrics, ATTACHMENT):
+                        part_path = await self._download_file_get(url, store.part_path(url))
+
+                    sha256 = await asyncio.get_event_loop().run_in_executor(None, file_sha256, part_path)
+                    store.add(url, part_path, sha256)
+                except (aiohttp.ClientError, asyncio.TimeoutError, InvalidDownload) as error:
+                    errors[url] = error
+
+        await asyncio.gather(*[worker(url) for url in urls if not store.has_url(url)])
+
+        result = {protocolo: store.link(protocolo, files, errors) for protocolo, files in attachments.items()}
+        store.save()
+        return result
+
+    async def download_attachments(self, attachments: typing.Mapping[str, typing.Iterable[tuple]], path: str = ".",
+                                   concurrency: int = 8) -> typing.Dict[str, typing.List[dict]]:
+        """
+        Download the attachments found by resolve_attachments (or arquivos_anexados).
+        Files are stored once per content hash (objects/<sha256[:2]>/<sha256>) and attachments.json maps
+        each protocol to its files, urls already downloaded in previous runs are skipped.
+
+        :param attachments: dict(ProtocoloPedido => Resolved or Iterable( file_url, file_name ))
+        :param path: Storage directory
+        :param concurrency: Maximum number of simultaneous downloads
+        :return: dict(ProtocoloPedido => list of {"name", "url", "sha256", "size", "path"})
+        """
+        attachments = {
+            protocolo: files.attachments if isinstance(files, Resolved) else files
+            for protocolo, files in attachments.items()
+        }
+
+        return await self._download_attachments(attachments, AttachmentStore(path), concurrency)
+
+    async def _uncronpress_zip(self, zip_path: str, output: str, members: MemberFilter = None,
+                               workers: int = _EXTRACT_WORKERS_) -> typing.List[str]:
         """
         Method responsible for unzipping the zip file and sending it to the destination folder.
+        The members are decompressed in parallel worker threads, away from the event loop,
+        and the ones already extracted (same size and CRC) are skipped.
         :param zip_path: Zip file location
         :param output: Output directory location.
-        :return: Output directory location.
+        :param members: Filter of the member names, e.g. lambda name: "_Pedidos_" in name
+        :param workers: Maximum number of members being decompressed at the same time
+        :return: Location of the members (extracted or already up to date)
         """
-
+        with timer(self.metrics, EXTRACT):
+            return await asyncio.get_event_loop().run_in_executor(
+                None, AsyncBuscarPedidosRespostas._extract_zip, zip_path, output, members, workers, self.metrics
+            )
+
+    @staticmethod
+    def _extract_zip(zip_path: str, output: str, members: MemberFilter = None,
+                     workers: int = _EXTRACT_WORKERS_, metrics: Metrics = None) -> typing.List[str]:
         # We need to create the directory if it doesn't exist.
-        if not os.path.exists(output):
-            os.makedirs(output, exist_ok=True)
+        os.makedirs(output, exist_ok=True)
 
         with zipfile.ZipFile(zip_path, "r") as zip_obj:
-            zip_obj.extractall(output)
+            infos = [info for info in zip_obj.infolist()
+                     if not info.is_dir() and (members is None or members(info.filename))]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(infos)))) as executor:
+            return list(executor.map(
+                functools.partial(AsyncBuscarPedidosRespostas._extract_member, zip_path, output, metrics=metrics),
+                infos
+            ))
 
-        return output
+    @staticmethod
+    def _extract_member(zip_path: str, output: str, info: zipfile.ZipInfo, metrics: Metrics = None) -> str:
+        """
+        Extracts one member, each thread opens the zip by itself (zlib releases the GIL while decompressing).
+        :param zip_path: Zip file location
+        :param output: Output directory location
+        :param info: Member to be extracted
+        :param metrics: Receives the extracted bytes and the skipped members
+        :return: Member location
+        """
+        target = os.path.join(output, info.filename)
+
+        if os.path.isfile(target) and os.path.getsize(target) == info.file_size and \
+                AsyncBuscarPedidosRespostas._crc32(target) == info.CRC:
+            if metrics is not None:
+                metrics.increment("members_skipped")
+
+            return target
+
+        with zipfile.ZipFile(zip_path, "r") as zip_obj:
+            target = zip_obj.extract(info, output)
+
+        if metrics is not None:
+            metrics.increment("bytes_extracted", info.file_size)
+
+        return target
+
+    @staticmethod
+    def _crc32(path: str) -> int:
+        crc = 0
+
+        with open(path, "rb") as handler:
+            for chunk in iter(lambda: handler.read(_CHUNK_SIZE_), b""):
+                crc = zlib.crc32(chunk, crc)
+
+        return crc
 
     async def _write_file(self, path: str, data: bytes) -> tuple:
         """
@@ -120,23 +404,356 @@ class BuscarPedidosRespostas:
 
         return True, path
 
-    async def _download_file_post(self, url: str, body: dict, path: str) -> str:
+    async def _download_file_post(self, url: str, body: dict, path: str, progress: ProgressCallback = None,
+                                  known: ManifestEntry = None) -> typing.Tuple[typing.Optional[str], ManifestEntry]:
         """
-        Method responsible for downloading the file after performing the POST method
+        Method responsible for downloading the file after performing the POST method.
+        The response is streamed in chunks to a ".part" file, if the connection drops we resume
+        from where it stopped (HTTP Range + If-Range) and, at the end, the file is checked before being renamed.
+        A part is only resumed when the validator (ETag or Last-Modified) saved next to it is still the same,
+        otherwise old and new bytes of a republished file would be spliced together.
         :param url: URL to submit
         :param body: Form data
         :param path: Download location
-        :return: Download file location
+        :param progress: Called after each chunk with (downloaded bytes, total bytes or None)
+        :param known: Last download of this file, when it did not change the body is not read at all
+        :return: tuple(Download file location or None when unchanged, ManifestEntry without hash)
         """
-        async with self.client.post(url, data=body) as response:
+        headers = {}
+
+        if known:
+            if known.etag:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified:
+                headers["If-Modified-Since"] = known.last_modified
+
+        # Connection errors and 5xx before the body are already retried by _request.
+        response = await self._request("POST", url, data=body, headers=headers)
+        attempt = 0
+
+        async with response:
+            # A failed precondition of a POST is answered with 412 instead of 304.
+            if response.status in (304, 412) and headers:
+                return None, known
+
             response.raise_for_status()
-            fname = re.findall("filename=(.+)", response.headers.get("content-disposition"))[0]
-            file_path = os.path.join(path, str(fname).replace("\"", ""))
+            file_path = self._content_disposition_path(response, path)
+            part_path = file_path + ".part"
+            remote = ManifestEntry(
+                file_name=os.path.basename(file_path),
+                size=response.content_length,
+                last_modified=response.headers.get("Last-Modified", ""),
+                etag=response.headers.get("ETag", "")
+            )
+
+            # We only needed the headers to know that nothing changed.
+            if known and DownloadManifest.is_unchanged(known, remote.file_name, remote.size, remote.last_modified,
+                                                       remote.etag):
+                return None, known
+
+            validator = self._validator(response)
+            total = response.content_length
+
+            # A previous run left a partial file of the same version, let's ask only for the missing bytes.
+            resume = os.path.exists(part_path) and os.path.getsize(part_path) and validator and \
+                self._read_validator(part_path) == validator and \
+                response.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+            if not resume:
+                self._write_validator(part_path, validator)
+
+                try:
+                    await self._stream_to_file(response, part_path, 0, total, progress)
+                except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                    # The connection dropped in the middle of the body, the rest is resumed below.
+                    attempt = await self._retry_stream(0, error)
+                    resume = True
+
+        if resume:
+            total = await self._download_part("POST", url, part_path, validator, progress, attempt, data=body)
+
+        # The CRC check reads the whole archive, away from the event loop (other downloads keep going).
+        await asyncio.get_event_loop().run_in_executor(None, self._check_download, file_path + ".part", total)
+        os.replace(file_path + ".part", file_path)
+        self._write_validator(file_path + ".part", "")
+        return file_path, remote._replace(size=os.path.getsize(file_path))
+
+    @staticmethod
+    def _validator(response: aiohttp.ClientResponse) -> str:
+        """
+        Strong validator of the response, usable in If-Range (weak ETags are not).
+        :param response: Response with the file
+        :return: ETag, Last-Modified or "" when the server sends none
+        """
+        etag = response.headers.get("ETag", "")
+
+        if etag and not etag.startswith("W/"):
+            return etag
+
+        return response.headers.get("Last-Modified", "")
+
+    @staticmethod
+    def _read_validator(part_path: str) -> str:
+        """
+        :param part_path: Partial file location
+        :return: Validator of the version being downloaded into it, "" when unknown
+        """
+        try:
+            with open(part_path + _VALIDATOR_SUFFIX_, "r", encoding="utf-8") as handler:
+                return handler.read().strip()
+        except OSError:
+            return ""
+
+    @staticmethod
+    def _write_validator(part_path: str, validator: str):
+        """
+        Saves the validator next to the partial file, an empty one removes it.
+        :param part_path: Partial file location
+        :param validator: ETag or Last-Modified
+        """
+        if validator:
+            with open(part_path + _VALIDATOR_SUFFIX_, "w", encoding="utf-8") as handler:
+                handler.write(validator)
+        elif os.path.exists(part_path + _VALIDATOR_SUFFIX_):
+            os.remove(part_path + _VALIDATOR_SUFFIX_)
+
+    async def _download_file_get(self, url: str, part_path: str, progress: ProgressCallback = None) -> str:
+        """
+        Streams a GET response to disk, resuming the partial file left by a previous run
+        when it holds the same version of the file (see _download_part).
+        :param url: File url
+        :param part_path: Partial file location
+        :param progress: Called after each chunk with (downloaded bytes, total bytes or None)
+        :return: part_path
+        """
+        total = await self._download_part("GET", url, part_path, self._read_validator(part_path), progress)
+
+        if total is not None and os.path.getsize(part_path) != total:
+            os.remove(part_path)
+            raise InvalidDownload(f"The downloaded file is incomplete ({url}).")
+
+        self._write_validator(part_path, "")
+        return part_path
+
+    async def _download_part(self, method: str, url: str, part_path: str, validator: str = "",
+                             progress: ProgressCallback = None, attempt: int = 0,
+                             **kwargs) -> typing.Optional[int]:
+        """
+        Downloads (or resumes) a file into part_path, retrying when the connection drops in the middle of the body.
+        The partial file is only resumed (HTTP Range + If-Range) with the validator (ETag or Last-Modified)
+        of the version it holds, otherwise a changed file would have old and new bytes spliced together:
+        without one the download starts over, and when the file changed the server sends it whole.
+        :param method: HTTP method
+        :param url: File url
+        :param part_path: Partial file location
+        :param validator: Validator of the bytes already in part_path
+        :param progress: Called after each chunk with (downloaded bytes, total bytes or None)
+        :param attempt: Stream retries already spent
+        :param kwargs: aiohttp request arguments
+        :return: Complete size, None when unknown
+        """
+        total = None
+
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {}
+
+            if offset and validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            else:
+                offset = 0
+
+            # Connection errors and 5xx before the body are already retried by _request.
+            response = await self._request(method, url, headers=headers, **kwargs)
+
+            try:
+                async with response:
+                    if response.status == 416 and offset:
+                        # The part already has every byte.
+                        return total
+
+                    response.raise_for_status()
+
+                    if response.status == 206:
+                        start, total = self._content_range(response)
+
+                        if start != offset:
+                            # The server answered another range, it is safer to start again.
+                            os.remove(part_path)
+                            continue
+                    else:
+                        # Whole file, from the start: the part (if any) is replaced by this version.
+                        offset = 0
+                        total = response.content_length
+                        validator = self._validator(response)
+                        self._write_validator(part_path, validator)
+
+                    await self._stream_to_file(response, part_path, offset, total, progress)
+                return total
+
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                # The connection dropped in the middle of the body, the next request resumes it.
+                attempt = await self._retry_stream(attempt, error)
+
+    async def _retry_stream(self, attempt: int, error: Exception) -> int:
+        """
+        Waits before resuming a dropped body, re-raising the error when the retries are over.
+        :param attempt: Stream retries already spent
+        :param error: Error that dropped the body
+        :return: attempt + 1
+        """
+        attempt += 1
+
+        if self.metrics is not None:
+            self.metrics.increment("retries", reason="stream")
+
+        if attempt > self.retries:
+            raise error
+
+        await asyncio.sleep(self._backoff(attempt))
+        return attempt
+
+    async def _request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Sends the request, retrying connection errors, timeouts, 429 and 5xx with jittered exponential backoff.
+        Only used for idempotent requests (GET and the download form POST).
+        :param method: HTTP method
+        :param url: Request location
+        :param kwargs: aiohttp request arguments
+        :return: Response (use it with "async with" to release the connection)
+        """
+        attempt = 0
+
+        while True:
+            retry_after = None
+
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if attempt >= self.retries:
+                    raise
+
+                reason = "timeout" if isinstance(error, asyncio.TimeoutError) else "connection"
+            else:
+                if response.status not in _RETRY_STATUS_ or attempt >= self.retries:
+                    return response
+
+                reason = str(response.status)
+                retry_after = response.headers.get("Retry-After")
+                response.release()
+
+            if self.metrics is not None:
+                self.metrics.increment("retries", reason=reason)
+
+            attempt += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        """
+        "Full jitter" exponential backoff, a Retry-After in seconds sent by the server wins.
+        :param attempt: Attempt number (1 for the first retry)
+        :param retry_after: Retry-After header
+        :return: Delay in seconds
+        """
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def _stream_to_file(self, response: aiohttp.ClientResponse, path: str, offset: int,
+                              total: typing.Optional[int], progress: ProgressCallback = None) -> int:
+        """
+        Writes the response body in fixed size chunks, without keeping it in memory.
+        :param response: Response to be read
+        :param path: File location
+        :param offset: Position where the writing starts (resume)
+        :param total: Expected file size, if known
+        :param progress: Called after each chunk with (downloaded bytes, total bytes or None)
+        :return: Written bytes (including offset)
+        """
+        position = offset
+
+        try:
+            async with aiofile.AIOFile(path, "ab" if offset else "wb") as afp:
+                async for chunk in response.content.iter_chunked(_CHUNK_SIZE_):
+                    await afp.write(chunk, offset=position)
+                    position += len(chunk)
+
+                    if progress:
+                        progress(position, total)
+
+                await afp.fsync()
+        finally:
+            # Bytes of an interrupted body were transferred as well.
+            if self.metrics is not None:
+                self.metrics.increment("bytes_downloaded", position - offset)
+
+        return position
+
+    @staticmethod
+    def _zip_members(zip_path: str, output: str, file_format: str) -> typing.List[str]:
+        """
+        Location of the extracted files of a zip
+        :param zip_path: Zip file location
+        :param output: Directory where the zip was extracted
+        :param file_format: Desired file format
+        :return: List of file locations
+        """
+        with zipfile.ZipFile(zip_path, "r") as zip_obj:
+            return [os.path.join(output, name) for name in zip_obj.namelist()
+                    if name.lower().endswith(f".{file_format.lower()}")]
+
+    @staticmethod
+    def _content_disposition_path(response: aiohttp.ClientResponse, path: str) -> str:
+        """
+        Returns the download location based on the content-disposition header
+        :param response: POST response
+        :param path: Download location
+        :return: File location
+        """
+        fname = re.findall("filename=(.+)", response.headers.get("content-disposition", ""))
+
+        if not fname:
+            raise InvalidDownload("The portal did not answer with a file.")
+
+        return os.path.join(path, str(fname[0]).replace("\"", ""))
+
+    @staticmethod
+    def _content_range(response: aiohttp.ClientResponse) -> typing.Tuple[int, typing.Optional[int]]:
+        """
+        Reads the Content-Range header of a partial response
+        :param response: Partial response (206)
+        :return: tuple(first byte, complete size or None)
+        """
+        match = re.match(r"bytes\s+(\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", ""))
+
+        if not match:
+            return -1, None
+
+        return int(match.group(1)), int(match.group(2)) if match.group(2) != "*" else None
+
+    @staticmethod
+    def _check_download(path: str, total: typing.Optional[int]):
+        """
+        Integrity check of the downloaded zip (size and the CRC of every member),
+        a broken file is removed so the next attempt starts over.
+        :param path: File location
+        :param total: Expected size, if known
+        """
+        size = os.path.getsize(path)
+        valid = (total is None or size == total) and zipfile.is_zipfile(path)
 
-            with open(file_path, "wb") as f:
-                f.write(await response.read())
+        if valid:
+            try:
+                with zipfile.ZipFile(path, "r") as zip_obj:
+                    valid = zip_obj.testzip() is None
+            except (zipfile.BadZipFile, zlib.error, EOFError, OSError):
+                valid = False
 
-        return file_path
+        if not valid:
+            os.remove(path)
+            raise InvalidDownload(f"The downloaded file is incomplete or corrupted ({size} of {total} bytes).")
 
     async def _get_content(self, url: str) -> bytes:
         """
@@ -144,7 +761,7 @@ class BuscarPedidosRespostas:
         :param url: request location
         :return: Request Content
         """
-        async with self.client.get(url) as response:
+        async with await self._request("GET", url) as response:
             response.raise_for_status()
             data = await response.read()
 
@@ -152,31 +769,235 @@ class BuscarPedidosRespostas:
 
     async def _get_url_submit_fields(self, url: str) -> dict:
         """
-        Returns form fields found in the provided url (input's only)
+        Returns form fields found in the provided url (input's only).
+        The fields (__VIEWSTATE, __EVENTVALIDATION, ...) are cached for the session, concurrent downloads
+        wait for the same request instead of fetching the page again.
         :param url: Form url
         :return: Fields dict
         """
-        data = await self._get_content(url)
-        return await self._bs4_find_fields(data)
+        if self._form_lock is None:
+            self._form_lock = asyncio.Lock()
+
+        async with self._form_lock:
+            cached = self._form_fields.get(url)
+
+            hit = cached is not None and time.monotonic() - cached[0] <= _FORM_STATE_TTL_
+
+            if not hit:
+                with timer(self.metrics, FORM):
+                    data = await self._get_content(url)
+                    cached = self._form_fields[url] = (time.monotonic(), find_inputs(data.decode(_ENCODING_)))
+
+            if self.metrics is not None:
+                (self.metrics.cache_hit if hit else self.metrics.cache_miss)("form")
 
-    async def _bs4_find_fields(self, content: bytes) -> dict:
+        return dict(cached[1])
+
+    def _invalidate_submit_fields(self, url: str, fields: dict):
+        """
+        Drops the cached form fields, unless another download already replaced the rejected ones.
+        :param url: Form url
+        :param fields: Rejected fields
+        """
+        cached = self._form_fields.get(url)
+
+        if cached is not None and cached[1] == fields:
+            del self._form_fields[url]
+
+    @staticmethod
+    def _form_data(fields: dict, year: int, file_format: str) -> dict:
         """
-        Finds content fields using bs4
-        :param content: HTML Content
-        :return: Form fields dict
+        :param fields: Form fields
+        :param year: Year of the desired file
+        :param file_format: Desired file format
+        :return: Form data to be submitted
         """
-        data = {}
-        soup = BeautifulSoup(content.decode(_ENCODING_), "lxml")
-        for form_input in soup.find_all("input"):
-            if form_input.has_attr("name") and form_input.has_attr("value"):
-                data[form_input["name"]] = form_input["value"]
+        data = dict(fields)
 
+        # Now, we need to inform the year and type of file we want.
+        data[_SELECT_YEAR_] = year
+        data[_SELECT_FORMAT_] = file_format
         return data
 
+    @property
+    def client(self) -> aiohttp.ClientSession:
+        # Created on first use, so it belongs to the loop that is running the requests.
+        if self._client is None:
+            self._client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(**self._connector_options),
+                                                 timeout=self._timeout)
+
+        return self._client
+
+
+class BuscarPedidosRespostas:
+
+    """
+    Class used to facilitate the search process within the portal.
+    Sync facade of AsyncBuscarPedidosRespostas: the requests run in an event loop owned by a background thread,
+    so one instance can be shared by many threads (and the same connection pool) and used by code
+    that already has a loop of its own. The progress callbacks are called from that thread.
+    """
+
+    _loop: asyncio.AbstractEventLoop = None
+    _thread: threading.Thread = None
+
+    def __init__(self, *args, **kwargs):
+        """
+        Same parameters as AsyncBuscarPedidosRespostas (connection pool, timeouts, retries and metrics).
+        """
+        self._async = AsyncBuscarPedidosRespostas(*args, **kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="BuscarPedidosRespostas", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _run(self, coroutine: typing.Awaitable) -> typing.Any:
+        """
+        Runs the coroutine in the background loop and waits for the result (thread-safe).
+        :param coroutine: Coroutine to be run
+        :return: Coroutine result
+        """
+        if self._loop is None:
+            coroutine.close()
+            raise RuntimeError("This instance was closed.")
+
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("The sync methods can not be called from the progress callbacks.")
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        """
+        Closes the session and stops the background loop.
+        """
+        if self._loop is None:
+            return
+
+        self._run(self._async.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        atexit.unregister(self.close)
+
+    def download_csv(self, year: int = 2016, path: str = ".", delete_zip: bool = False,
+                     progress: ProgressCallback = None, manifest: DownloadManifest = None,
+                     extract: bool = True, members: MemberFilter = None) -> typing.Iterator[str]:
+        """
+        Download CSV files
+
+        :param year: Year of the desired file
+        :param path: Place to be saved
+        :param delete_zip: Should we delete the zip?
+        :param progress: Called after each downloaded chunk with (downloaded bytes, total bytes or None)
+        :param manifest: When informed, skips the download if the file did not change
+        :param extract: When False, returns the zip location instead of extracting it (FileParser reads zips)
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
+        :return: Generator<str>
+        """
+        return self._run(self._async.download_csv(year, path, delete_zip, progress, manifest, extract, members))
+
+    def download_xml(self, year: int = 2016, path: str = ".", delete_zip: bool = False,
+                     progress: ProgressCallback = None, manifest: DownloadManifest = None,
+                     extract: bool = True, members: MemberFilter = None) -> typing.Iterator[str]:
+        """
+        Download the XML files
+        :param year: Year of the desired file
+        :param path: Place to be saved
+        :param delete_zip: Should we delete the zip?
+        :param progress: Called after each downloaded chunk with (downloaded bytes, total bytes or None)
+        :param manifest: When informed, skips the download if the file did not change
+        :param extract: When False, returns the zip location instead of extracting it (FileParser reads zips)
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
+        :return: Generator<str>
+        """
+        return self._run(self._async.download_xml(year, path, delete_zip, progress, manifest, extract, members))
+
+    def download_many(self, years: typing.Iterable[int], formats: typing.Iterable[str] = ("XML",), path: str = ".",
+                      delete_zip: bool = False, concurrency: int = 2,
+                      progress: typing.Callable[[int, str, int, typing.Optional[int]], None] = None,
+                      manifest: DownloadManifest = None, extract: bool = True,
+                      members: MemberFilter = None) -> \
+            typing.Iterator[DownloadResult]:
+        """
+        Download several years and formats at once, sharing the same connection pool.
+        The downloads only run while the generator is being consumed.
+
+        :param years: Desired years, e.g. range(2016, 2020)
+        :param formats: Desired formats (CSV and/or XML)
+        :param path: Place to be saved
+        :param delete_zip: Should we delete the zips?
+        :param concurrency: Maximum number of simultaneous downloads
+        :param progress: Called after each downloaded chunk with (year, format, downloaded bytes, total bytes or None)
+        :param manifest: When informed, years that did not change since the last download are skipped
+        :param extract: When False, the zip locations are returned instead of the extracted files
+        :param members: Filter of the zip members to extract, e.g. lambda name: "_Pedidos_" in name
+        :return: Generator<DownloadResult>, in the order they finish
+        """
+        results = self._async.download_many(years, formats, path, delete_zip, concurrency, progress, manifest, extract,
+                                            members)
+
+        try:
+            while True:
+                try:
+                    yield self._run(BuscarPedidosRespostas._next(results))
+                except StopAsyncIteration:
+                    break
+        finally:
+            if self._loop is not None:
+                self._run(results.aclose())
+
+    def resolve_attachments(self, records: typing.Iterable[dict], cache: str = None,
+                            ttl: float = _RESOLVER_CACHE_TTL_, concurrency: int = 10) -> typing.Dict[str, Resolved]:
+        """
+        Finds the item page and the attachments of many Pedidos/Recursos at once, on this session.
+
+        :param records: Iterable<Pedido|Recurso>
+        :param cache: SQLite file used to keep the results between runs (keyed by ProtocoloPedido)
+        :param ttl: Lifetime of the cached results (seconds)
+        :param concurrency: Maximum number of protocols being resolved at the same time
+        :return: dict(ProtocoloPedido => Resolved(url, attachments))
+        """
+        return self._run(self._async.resolve_attachments(records, cache, ttl, concurrency))
+
+    def download_attachments(self, attachments: typing.Mapping[str, typing.Iterable[tuple]], path: str = ".",
+                             concurrency: int = 8) -> typing.Dict[str, typing.List[dict]]:
+        """
+        Download the attachments found by resolve_attachments (or arquivos_anexados).
+        Files are stored once per content hash (objects/<sha256[:2]>/<sha256>) and attachments.json maps
+        each protocol to its files, urls already downloaded in previous runs are skipped.
+
+        :param attachments: dict(ProtocoloPedido => Resolved or Iterable( file_url, file_name ))
+        :param path: Storage directory
+        :param concurrency: Maximum number of simultaneous downloads
+        :return: dict(ProtocoloPedido => list of {"name", "url", "sha256", "size", "path"})
+        """
+        return self._run(self._async.download_attachments(attachments, path, concurrency))
+
+    @staticmethod
+    async def _next(generator: typing.AsyncIterator) -> typing.Any:
+        # run_coroutine_threadsafe only accepts coroutines, __anext__ returns an awaitable.
+        return await generator.__anext__()
+
     @property
     def loop(self) -> asyncio.AbstractEventLoop:
         return self._loop
 
     @property
-    def client(self) -> aiohttp.ClientSession:
-        return self._client
+    def metrics(self) -> typing.Optional[Metrics]:
+        return self._async.metrics
+
+    @property
+    def async_instance(self) -> AsyncBuscarPedidosRespostas:
+        return self._async
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,245 @@
+import sqlite3, typing
+from E_Sic.pedidos_respostas.converters import to_int, to_datetime, to_date, to_bool
+from E_Sic.pedidos_respostas.conts import _INT_FIELDS_, _DATETIME_FIELDS_, _DATE_FIELDS_, _BOOL_FIELDS_
+from E_Sic.pedidos_respostas.types import Pedido, Recurso, Solicitante
+
+# Record type => table
+_TABLES = (
+    (Pedido, "pedidos"),
+    (Recurso, "recursos"),
+    (Solicitante, "solicitantes"),
+)
+
+# Dropped during a bulk load and created once at the end (finish), keeping them up to date row by row is much slower.
+_INDEXES = (
+    ("pedidos", "IdSolicitante"),
+    ("pedidos", "ProtocoloPedido"),
+    ("recursos", "IdPedido"),
+    ("recursos", "IdSolicitante"),
+    ("recursos", "ProtocoloPedido"),
+    ("recursos", "IdRecursoPrecedente"),
+)
+
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+class SQLiteSink:
+    """
+    Bulk ingestion of the FileParser records in a SQLite database, one table per record type
+    (pedidos, recursos and solicitantes). Ingesting the same file again updates the rows instead of duplicating them.
+
+    with SQLiteSink("esic.db") as sink:
+        for file_location in files:
+            sink.ingest(FileParser(file_location).open())
+
+    The first load of an empty database runs without the secondary indexes, they are created once by finish()
+    (or close()), not after each file.
+    """
+
+    _database: str = ""
+    _connection: sqlite3.Connection = None
+    _bulk: bool = False
+
+    def __init__(self, database: str, batch_size: int = 50000):
+        """
+        :param database: SQLite file location
+        :param batch_size: Records inserted per transaction
+        """
+        self._database = database
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(database, isolation_level=None)
+
+        for pragma in _PRAGMAS:
+            self._connection.execute(pragma)
+
+        for record_type, table in _TABLES:
+            self._connection.execute(SQLiteSink._create_table(record_type, table))
+
+        # Cheap on a new database, and the deltas (apply) of an existing one rely on them.
+        self.create_indexes(analyze=False)
+
+    def ingest(self, records: typing.Iterable[dict], bulk: bool = None) -> int:
+        """
+        Inserts (or replaces) the records in batches.
+        Records without id (IdPedido, IdRecurso or IdSolicitante) are skipped, they could not be updated later
+        and each new ingestion would duplicate them.
+        :param records: Iterable<Pedido|Recurso|Solicitante>
+        :param bulk: Drop the secondary indexes until finish(), by default only when the database is empty
+        :return: Number of ingested records
+        """
+        if bulk is None:
+            bulk = self._bulk or self._is_empty()
+
+        if bulk and not self._bulk:
+            self.drop_indexes()
+            self._bulk = True
+
+        batches = {}
+        count = 0
+
+        for record in records:
+            record_type = SQLiteSink._record_type(record)
+            row = SQLiteSink._row(record_type, record)
+
+            if row[record_type._fields.index(record_type._key)] is None:
+                continue
+
+            batch = batches.get(record_type)
+
+            if batch is None:
+                batch = batches[record_type] = []
+
+            batch.append(row)
+            count += 1
+
+            if len(batch) >= self.batch_size:
+                self._insert(record_type, batch)
+
+        for record_type, batch in batches.items():
+            self._insert(record_type, batch)
+
+        return count
+
+    def apply(self, changes: typing.Iterable[tuple]) -> typing.Tuple[int, int]:
+        """
+        Applies the output of FingerprintStore.diff: inserted and changed records are written, removed ones deleted.
+        The indexes are kept (and updated row by row), a delta is small compared to the tables.
+        :param changes: Iterable<Change>
+        :return: tuple(written records, deleted records)
+        """
+        removed = {}
+
+        def records() -> typing.Iterator[dict]:
+            for change in changes:
+                if change.record is None:
+                    removed.setdefault(change.record_type, []).append((change.key,))
+                else:
+                    yield change.record
+
+        count = self.ingest(records(), bulk=False)
+        deleted = 0
+
+        self._connection.execute("BEGIN")
+
+        try:
+            for record_type, keys in removed.items():
+                self._connection.executemany(
+                    f"DELETE FROM {dict(_TABLES)[record_type]} WHERE {record_type._key} = ?", keys
+                )
+                deleted += len(keys)
+
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        return count, deleted
+
+    def finish(self):
+        """
+        Ends the bulk load: creates the secondary indexes and updates the statistics, once for every ingested file.
+        """
+        if self._bulk:
+            self.create_indexes()
+            self._bulk = False
+
+    def create_indexes(self, analyze: bool = True):
+        for table, column in _INDEXES:
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+
+        if analyze:
+            self._connection.execute("ANALYZE")
+
+    def drop_indexes(self):
+        for table, column in _INDEXES:
+            self._connection.execute(f"DROP INDEX IF EXISTS idx_{table}_{column}")
+
+    def close(self):
+        if self._connection is not None:
+            self.finish()
+            self._connection.execute("PRAGMA optimize")
+            self._connection.close()
+            self._connection = None
+
+    def _is_empty(self) -> bool:
+        return not any(self._connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for _, table in _TABLES)
+
+    def _insert(self, record_type: type, rows: typing.List[tuple]):
+        if not rows:
+            return
+
+        table = dict(_TABLES)[record_type]
+        columns = ", ".join(record_type._fields)
+        placeholders = ", ".join("?" * len(record_type._fields))
+
+        self._connection.execute("BEGIN")
+
+        try:
+            self._connection.executemany(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})", rows)
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        rows.clear()
+
+    @staticmethod
+    def _row(record_type: type, record: dict) -> tuple:
+        row = []
+
+        for field in record_type._fields:
+            value = record.get(field, "")
+
+            if field in _INT_FIELDS_:
+                value = to_int(value)
+            elif field in _DATETIME_FIELDS_:
+                value = to_datetime(value)
+                value = value.isoformat(" ") if value else None
+            elif field in _DATE_FIELDS_:
+                value = to_date(value)
+                value = value.isoformat() if value else None
+            elif field in _BOOL_FIELDS_:
+                value = to_bool(value)
+
+            row.append(value)
+
+        return tuple(row)
+
+    @staticmethod
+    def _create_table(record_type: type, table: str) -> str:
+        columns = []
+
+        for field in record_type._fields:
+            column_type = "INTEGER" if field in _INT_FIELDS_ or field in _BOOL_FIELDS_ else "TEXT"
+            primary_key = " PRIMARY KEY" if field == record_type._key else ""
+            columns.append(f"{field} {column_type}{primary_key}")
+
+        return f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})"
+
+    @staticmethod
+    def _record_type(record: dict) -> type:
+        for record_type, table in _TABLES:
+            if isinstance(record, record_type):
+                return record_type
+
+        raise TypeError(f"Unexpected record type: {type(record).__name__}")
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._connection
+
+    @property
+    def database(self) -> str:
+        return self._database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,7 +1,8 @@
-from E_Sic.pedidos_respostas.types.recurso import Recurso
-from E_Sic.pedidos_respostas.types.pedido import Pedido
-from E_Sic.pedidos_respostas.types.solicitante import Solicitante
-
-"""
-    http://www.consultaesic.cgu.gov.br/arquivosRelatorios/PedidosRespostas/Dicionario-Dados-Exportacao.txt
-"""
+from E_Sic.pedidos_respostas.types.recurso import Recurso
+from E_Sic.pedidos_respostas.types.pedido import Pedido
+from E_Sic.pedidos_respostas.types.solicitante import Solicitante
+from E_Sic.pedidos_respostas.types.compact import CompactRecord, CompactPedido, CompactRecurso, CompactSolicitante
+
+"""
+    http://www.consultaesic.cgu.gov.br/arquivosRelatorios/PedidosRespostas/Dicionario-Dados-Exportacao.txt
+"""
@@ -0,0 +1,93 @@
+import collections.abc, typing
+from E_Sic.pedidos_respostas.conts import _CATEGORICAL_FIELDS_
+from E_Sic.pedidos_respostas.types.pedido import Pedido
+from E_Sic.pedidos_respostas.types.recurso import Recurso
+from E_Sic.pedidos_respostas.types.solicitante import Solicitante
+
+
+class CompactRecord(collections.abc.Mapping):
+    """
+    Read-only record that keeps each column of the data dictionary in a slot instead of a dict entry.
+    The properties (id_pedido, situacao, ...) are the same of the original types and isinstance(record, Pedido)
+    still works. Attributes that are not in the data dictionary are discarded.
+    """
+    __slots__ = ()
+    _fields: typing.Tuple[str, ...] = ()
+    _field_set: typing.FrozenSet[str] = frozenset()
+
+    def __init__(self, values: typing.Union[typing.Mapping[str, str], typing.Iterable[tuple]] = (),
+                 interned: typing.Dict[str, str] = None):
+        """
+        :param values: Mapping or pairs (column, value)
+        :param interned: Shared dict used to keep a single copy of the repetitive (categorical) values
+        """
+        self._direct_url = None
+        self._date_cache = None
+
+        for key, value in (values.items() if isinstance(values, collections.abc.Mapping) else values):
+            if key not in self._field_set:
+                continue
+
+            if interned is not None and key in _CATEGORICAL_FIELDS_:
+                value = interned.setdefault(value, value)
+
+            setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        if key not in self._field_set:
+            return default
+
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> str:
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+
+        raise KeyError(key)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return (key for key in self._fields if hasattr(self, key))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """
+        :return: Plain dict (json.dumps friendly)
+        """
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def compact_type(record_type: type) -> type:
+    """
+    Builds the slotted version of a record type, reusing its properties.
+    :param record_type: Pedido, Recurso or Solicitante
+    :return: CompactRecord subclass, registered as a virtual subclass of record_type
+    """
+    namespace = {name: value for name, value in vars(record_type).items() if isinstance(value, property)}
+    namespace["__slots__"] = tuple(record_type._fields) + ("_direct_url", "_date_cache")
+    namespace["__doc__"] = f"Compact (slotted) {record_type.__name__}."
+    namespace["_fields"] = record_type._fields
+    namespace["_field_set"] = frozenset(record_type._fields)
+    namespace["_key"] = record_type._key
+
+    compact = type(f"Compact{record_type.__name__}", (CompactRecord,), namespace)
+    record_type.register(compact)
+    return compact
+
+
+CompactPedido = compact_type(Pedido)
+CompactRecurso = compact_type(Recurso)
+CompactSolicitante = compact_type(Solicitante)
+
+COMPACT_TYPES = {
+    Pedido: CompactPedido,
+    Recurso: CompactRecurso,
+    Solicitante: CompactSolicitante,
+}
@@ -0,0 +1,109 @@
+"""
+Local stand-in of DownloadDados.aspx: a GET returns the form with the ASP.NET hidden fields,
+the POST (year and format) returns the zip as an attachment, with Content-Length and Range support.
+"""
+import asyncio, os, secrets, threading, typing
+from aiohttp import web
+from E_Sic.pedidos_respostas.conts import _PATH_, _SELECT_YEAR_, _SELECT_FORMAT_
+
+_FORM = """<html><body><form method="post" action="./DownloadDados.aspx" id="aspnetForm">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="A1B2C3D4" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{validation}" />
+<select name="{year}"><option value="2016">2016</option></select>
+<select name="{file_format}"><option value="CSV">CSV</option><option value="XML">XML</option></select>
+<input type="submit" name="ctl00$PlaceHolderMain$btnDownload" value="Download" />
+</form></body></html>"""
+
+
+class Portal:
+    """
+    with Portal(archives) as portal:
+        BuscarPedidosRespostas(url=portal.url)
+    """
+
+    def __init__(self, archives: typing.Mapping[typing.Tuple[int, str], str], host: str = "127.0.0.1",
+                 port: int = 0):
+        """
+        :param archives: (year, format) => zip location
+        :param host: Listening address
+        :param port: Listening port, a free one when 0
+        """
+        self.archives = {(year, file_format.upper()): path for (year, file_format), path in archives.items()}
+        self.host = host
+        self.port = port
+        self.viewstate = secrets.token_urlsafe(512)
+        self.validation = secrets.token_urlsafe(64)
+        self.requests = {"GET": 0, "POST": 0}
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    async def _form(self, request: web.Request) -> web.Response:
+        self.requests["GET"] += 1
+        return web.Response(text=_FORM.format(viewstate=self.viewstate, validation=self.validation,
+                                              year=_SELECT_YEAR_, file_format=_SELECT_FORMAT_),
+                            content_type="text/html", charset="utf-8")
+
+    async def _download(self, request: web.Request) -> web.StreamResponse:
+        self.requests["POST"] += 1
+        form = await request.post()
+
+        if form.get("__VIEWSTATE") != self.viewstate or form.get("__EVENTVALIDATION") != self.validation:
+            # ASP.NET answers an invalid state with the error page.
+            return web.Response(text="<html><body>Erro</body></html>", content_type="text/html")
+
+        path = self.archives.get((int(form.get(_SELECT_YEAR_, 0)), str(form.get(_SELECT_FORMAT_, "")).upper()))
+
+        if path is None:
+            return web.Response(text="<html><body>Arquivo indisponível</body></html>", content_type="text/html")
+
+        return web.FileResponse(path, headers={
+            "Content-Type": "application/zip",
+            "Content-Disposition": f"attachment; filename={os.path.basename(path)}",
+        })
+
+    def start(self) -> "Portal":
+        """
+        Serves in a background thread (own event loop), the client can be sync or async.
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_get(f"/{_PATH_}", self._form)
+            app.router.add_post(f"/{_PATH_}", self._download)
+            self._runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, self.host, self.port)
+            self._loop.run_until_complete(site.start())
+            self.port = self._runner.addresses[0][1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="Portal", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/{_PATH_}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
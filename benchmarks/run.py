@@ -0,0 +1,244 @@
+"""
+Benchmarks of the package against synthetic archives served by a local stand-in of the portal.
+Throughput is measured in a first run and the peak memory in a second one, run in a forked child process:
+its peak resident set size also counts what tracemalloc does not see (lxml, zlib and other C allocations).
+
+python benchmarks/run.py --pedidos 100000 --years 2019 2020 --formats XML CSV --json results.json
+"""
+import argparse, collections, gc, json, os, platform, shutil, sys, tempfile, time, traceback, typing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from E_Sic.pedidos_respostas import BuscarPedidosRespostas, FileParser, types
+from E_Sic.pedidos_respostas.search import AsyncBuscarPedidosRespostas
+from portal import Portal
+import synthetic
+
+# Properties read by the "properties" stage, the ones the dashboards use.
+_PROPERTIES = ("id_pedido", "orgao_destinatario", "situacao", "data_registro", "prazo_atendimento", "data_resposta",
+               "foi_prorrogado")
+
+
+class Stage(typing.NamedTuple):
+    name: str
+    seconds: float
+    items: int
+    unit: str
+    size: int
+    peak: typing.Optional[int]
+    details: dict
+
+
+def measure(name: str, unit: str, function: typing.Callable[[], tuple], setup: typing.Callable[[], None] = None,
+            memory: bool = True) -> Stage:
+    """
+    :param name: Stage name
+    :param unit: What the items are (records, files, ...)
+    :param function: Callable() => tuple(items, bytes, details)
+    :param setup: Called before each run (not measured)
+    :param memory: Also run it in a child process to measure the peak memory
+    :return: Stage
+    """
+    if setup:
+        setup()
+
+    gc.collect()
+    start = time.perf_counter()
+    items, size, details = function()
+    seconds = time.perf_counter() - start
+    peak = None
+
+    if memory:
+        peak = _peak_rss(function, setup)
+
+    return Stage(name, seconds, items, unit, size, peak, details)
+
+
+def _peak_rss(function: typing.Callable[[], tuple], setup: typing.Callable[[], None] = None) -> typing.Optional[int]:
+    """
+    Runs the function in a forked child and reads the peak resident set size of that process,
+    which includes the interpreter and whatever the benchmark already holds in memory when the stage starts.
+    The child reports its own peak (RUSAGE_CHILDREN is the largest of every child, not of the last one).
+    :param function: Callable() => tuple(items, bytes, details)
+    :param setup: Called before the run (not measured)
+    :return: Peak RSS in bytes, None where fork or resource are not available (Windows)
+    """
+    if resource is None or not hasattr(os, "fork"):
+        return None
+
+    read, write = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        status = 1
+
+        try:
+            os.close(read)
+
+            if setup:
+                setup()
+
+            gc.collect()
+            function()
+            os.write(write, str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss).encode("ascii"))
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+
+    os.close(write)
+
+    with os.fdopen(read, "rb") as handler:
+        data = handler.read()
+
+    _, status = os.waitpid(pid, 0)
+
+    if status or not data:
+        raise RuntimeError("The memory run failed in the child process.")
+
+    # Kilobytes, except on macOS.
+    return int(data) * (1 if sys.platform == "darwin" else 1024)
+
+
+def _parse(files: typing.List[str], **kwargs) -> typing.Callable[[], tuple]:
+    def run():
+        counts = collections.Counter()
+
+        for file_name in files:
+            for record in FileParser(file_name, **kwargs).open():
+                counts[type(record).__name__.replace("Compact", "")] += 1
+
+        return sum(counts.values()), sum(map(os.path.getsize, files)), dict(counts)
+
+    return run
+
+
+def run(pedidos: int, years: typing.List[int], formats: typing.List[str], path: str, memory: bool = True,
+        concurrency: int = 2) -> typing.List[Stage]:
+    archives_path = os.path.join(path, "portal")
+    download_path = os.path.join(path, "download")
+    extract_path = os.path.join(path, "extract")
+    stages = []
+    archives = {}
+
+    def generate():
+        for year in years:
+            for file_format in formats:
+                archives[(year, file_format)] = synthetic.build_archive(archives_path, year, file_format, pedidos,
+                                                                        seed=year)
+
+        return len(archives), sum(map(os.path.getsize, archives.values())), {}
+
+    stages.append(measure("generate", "archives", generate, memory=False))
+
+    with Portal(archives) as portal:
+        zips = []
+
+        def download():
+            zips.clear()
+
+            # The client is created by each run, the thread of its event loop does not survive a fork.
+            with BuscarPedidosRespostas(url=portal.url) as client:
+                for result in client.download_many(years, formats, path=download_path, concurrency=concurrency,
+                                                   extract=False):
+                    if result.error:
+                        raise result.error
+
+                    zips.extend(result.files)
+
+            return len(zips), sum(map(os.path.getsize, zips)), {"requests": dict(portal.requests)}
+
+        stages.append(measure("download", "archives", download, memory=memory,
+                              setup=lambda: shutil.rmtree(download_path, ignore_errors=True) or
+                              os.makedirs(download_path)))
+
+    extracted = []
+
+    def extract():
+        extracted.clear()
+
+        for zip_path in zips:
+            extracted.extend(AsyncBuscarPedidosRespostas._extract_zip(zip_path, extract_path))
+
+        return len(extracted), sum(map(os.path.getsize, extracted)), {}
+
+    stages.append(measure("extract", "files", extract, memory=memory,
+                          setup=lambda: shutil.rmtree(extract_path, ignore_errors=True)))
+
+    for file_format in formats:
+        files = [name for name in extracted if name.lower().endswith(f".{file_format.lower()}")]
+        archives_of_format = [name for name in zips if f"_{file_format.lower()}_" in os.path.basename(name)]
+
+        stages.append(measure(f"parse {file_format}", "records", _parse(files), memory=memory))
+        stages.append(measure(f"parse {file_format} (compact)", "records", _parse(files, compact=True), memory=memory))
+        stages.append(measure(f"parse {file_format} (zip)", "records", _parse(archives_of_format), memory=memory))
+
+    pedidos_file = next(name for name in extracted if "_Pedidos_" in name)
+    records = [record for record in FileParser(pedidos_file).open() if isinstance(record, types.Pedido)]
+
+    def properties():
+        for record in records:
+            for name in _PROPERTIES:
+                getattr(record, name)
+
+        return len(records), 0, {"properties": len(_PROPERTIES)}
+
+    stages.append(measure("properties", "records", properties, memory=memory))
+    return stages
+
+
+def report(stages: typing.List[Stage]) -> str:
+    lines = [f"{'stage':<24}{'seconds':>10}{'items/s':>14}{'MB/s':>10}{'peak RSS MB':>13}  details"]
+
+    for stage in stages:
+        rate = stage.items / stage.seconds if stage.seconds else 0
+        mb_rate = stage.size / stage.seconds / 1e6 if stage.seconds and stage.size else 0
+        peak = f"{stage.peak / 1e6:.1f}" if stage.peak is not None else "-"
+        lines.append(f"{stage.name:<24}{stage.seconds:>10.3f}{rate:>14,.0f}{mb_rate:>10.1f}{peak:>13}  "
+                     f"{stage.items} {stage.unit} {stage.details or ''}")
+
+    return "\n".join(lines)
+
+
+def main(arguments: typing.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pedidos", type=int, default=20000, help="Pedidos per year (recursos are 10%%)")
+    parser.add_argument("--years", type=int, nargs="+", default=[2019, 2020])
+    parser.add_argument("--formats", nargs="+", default=["XML", "CSV"], choices=["XML", "CSV"])
+    parser.add_argument("--concurrency", type=int, default=2, help="Simultaneous downloads")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the memory runs")
+    parser.add_argument("--path", help="Working directory (a temporary one is created and removed by default)")
+    parser.add_argument("--json", help="Also writes the results to this file")
+    options = parser.parse_args(arguments)
+
+    path = options.path or tempfile.mkdtemp(prefix="esic_benchmark_")
+
+    try:
+        stages = run(options.pedidos, options.years, [name.upper() for name in options.formats], path,
+                     memory=not options.no_memory, concurrency=options.concurrency)
+    finally:
+        if not options.path:
+            shutil.rmtree(path, ignore_errors=True)
+
+    print(report(stages))
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as handler:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "pedidos": options.pedidos,
+                "years": options.years,
+                "formats": options.formats,
+                "stages": [stage._asdict() for stage in stages],
+            }, handler, indent=2)
+
+
+if __name__ == "__main__":
+    main()
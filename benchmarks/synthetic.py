@@ -0,0 +1,186 @@
+"""
+Synthetic e-SIC archives, with the same layout of the files published by the portal
+(one zip per year and format, members named like 20200101_Pedidos_xml_2020.xml, columns of the data dictionary).
+"""
+import os, random, zipfile, typing
+from xml.sax.saxutils import quoteattr
+from E_Sic.pedidos_respostas.types import Pedido, Recurso, Solicitante
+
+_ORGAOS = (
+    ("MEC – Ministério da Educação", "MEC – Ministério da Educação"),
+    ("MS – Ministério da Saúde", "ANVISA – Agência Nacional de Vigilância Sanitária"),
+    ("MS – Ministério da Saúde", "MS – Ministério da Saúde"),
+    ("ME – Ministério da Economia", "INSS – Instituto Nacional do Seguro Social"),
+    ("ME – Ministério da Economia", "RFB – Secretaria Especial da Receita Federal do Brasil"),
+    ("MJSP – Ministério da Justiça e Segurança Pública", "DPF – Departamento de Polícia Federal"),
+)
+_SITUACOES = ("Respondido", "Em Tramitação", "Respondido", "Respondido")
+_WORDS = (
+    "solicito", "informações", "sobre", "contrato", "licitação", "servidores", "salários", "obras", "escolas",
+    "hospitais", "vacinação", "dados", "relatório", "processo", "número", "valores", "pagamentos", "ano",
+    "município", "estado", "programa", "bolsa", "pesquisa", "universidade", "benefício", "aposentadoria",
+)
+_TIPOS_RESPOSTA = ("Acesso Concedido", "Acesso Negado", "Acesso Parcialmente Concedido", "Informação Inexistente")
+
+
+def _text(rand: random.Random, words: int) -> str:
+    return " ".join(rand.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _date(rand: random.Random, year: int, day: int = None, time: bool = True) -> str:
+    day = rand.randint(0, 364) if day is None else min(day, 364)
+    month, day = min(day // 30 + 1, 12), day % 28 + 1
+    value = f"{day:02d}/{month:02d}/{year}"
+    return f"{value} {rand.randint(8, 18):02d}:{rand.randint(0, 59):02d}:{rand.randint(0, 59):02d}" if time else value
+
+
+def pedidos(year: int, count: int, seed: int = 0) -> typing.Iterator[typing.Dict[str, str]]:
+    """
+    :param year: Year of the records
+    :param count: Number of pedidos
+    :param seed: Random seed, the same seed always generates the same records
+    :return: Generator<dict> with the Pedido columns
+    """
+    rand = random.Random(seed)
+
+    for index in range(1, count + 1):
+        superior, orgao = rand.choice(_ORGAOS)
+        day = rand.randint(0, 330)
+        respondido = rand.random() < 0.9
+
+        yield {
+            "IdPedido": str(year * 10000000 + index),
+            "ProtocoloPedido": f"{rand.randint(10000, 99999)}{index:06d}{year}{rand.randint(10, 99)}",
+            "OrgaoSuperiorAssociadoaoDestinatario": superior,
+            "OrgaoDestinatario": orgao,
+            "Situacao": rand.choice(_SITUACOES) if respondido else "Em Tramitação",
+            "DataRegistro": _date(rand, year, day),
+            "ResumoSolicitacao": _text(rand, rand.randint(4, 12)),
+            "DetalhamentoSolicitacao": _text(rand, rand.randint(20, 120)),
+            "PrazoAtendimento": _date(rand, year, day + 20, time=False),
+            "FoiProrrogado": rand.choice(("Sim", "Não", "Não", "Não")),
+            "FoiReencaminhado": rand.choice(("Sim", "Não", "Não")),
+            "FormaResposta": "Pelo sistema (com avisos por email)",
+            "OrigemSolicitacao": "Internet",
+            "IdSolicitante": str(rand.randint(1, max(1, count // 3))),
+            "CategoriaPedido": "Governo e Política",
+            "SubCategoriaPedido": "Administração pública",
+            "NumeroPerguntas": str(rand.randint(1, 5)),
+            "DataResposta": _date(rand, year, day + rand.randint(0, 40)) if respondido else "",
+            "Resposta": _text(rand, rand.randint(10, 80)) if respondido else "",
+            "TipoResposta": rand.choice(_TIPOS_RESPOSTA) if respondido else "",
+            "ClassificacaoTipoResposta": "Não se trata de solicitação de informação" if respondido else "",
+        }
+
+
+def recursos(year: int, count: int, pedidos_count: int, seed: int = 0) -> typing.Iterator[typing.Dict[str, str]]:
+    """
+    :param year: Year of the records
+    :param count: Number of recursos
+    :param pedidos_count: Number of pedidos of the year (the recursos point to them)
+    :param seed: Random seed
+    :return: Generator<dict> with the Recurso columns
+    """
+    rand = random.Random(seed + 1)
+
+    for index in range(1, count + 1):
+        superior, orgao = rand.choice(_ORGAOS)
+        day = rand.randint(20, 340)
+        precedente = year * 10000000 + index - 1 if index > 1 and rand.random() < 0.3 else None
+
+        yield {
+            "IdRecurso": str(year * 10000000 + index),
+            "IdRecursoPrecedente": str(precedente) if precedente else "",
+            "DescRecurso": _text(rand, rand.randint(10, 60)),
+            "IdPedido": str(year * 10000000 + rand.randint(1, max(1, pedidos_count))),
+            "IdSolicitante": str(rand.randint(1, max(1, pedidos_count // 3))),
+            "ProtocoloPedido": f"{rand.randint(10000, 99999)}{index:06d}{year}{rand.randint(10, 99)}",
+            "OrgaoSuperiorAssociadoaoDestinatario": superior,
+            "OrgaoDestinatario": orgao,
+            "Instancia": rand.choice(("Primeira Instância", "Segunda Instância", "CGU")),
+            "Situacao": rand.choice(("Respondido", "Em Tramitação")),
+            "DataRegistro": _date(rand, year, day),
+            "PrazoAtendimento": _date(rand, year, day + 5, time=False),
+            "OrigemSolicitacao": "Internet",
+            "TipoRecurso": "Informação recebida não corresponde à solicitada",
+            "DataResposta": _date(rand, year, day + rand.randint(0, 10)),
+            "RespostaRecurso": _text(rand, rand.randint(10, 60)),
+            "TipoResposta": rand.choice(("Deferido", "Indeferido", "Parcialmente deferido")),
+        }
+
+
+def solicitantes(count: int, seed: int = 0) -> typing.Iterator[typing.Dict[str, str]]:
+    """
+    :param count: Number of solicitantes
+    :param seed: Random seed
+    :return: Generator<dict> with the Solicitante columns
+    """
+    rand = random.Random(seed + 2)
+
+    for index in range(1, count + 1):
+        yield {
+            "IdSolicitante": str(index),
+            "TipoDemandante": rand.choice(("Pessoa Física", "Pessoa Jurídica")),
+            "DataNascimento": _date(rand, rand.randint(1950, 2000), time=False),
+            "Sexo": rand.choice(("Masculino", "Feminino", "Não Informado")),
+            "Escolaridade": rand.choice(("Ensino Superior", "Pós-graduação", "Ensino Médio")),
+            "Profissao": rand.choice(("Jornalista", "Pesquisador", "Servidor público", "Estudante")),
+            "TipoPessoaJuridica": "",
+            "Pais": "Brasil",
+            "UF": rand.choice(("SP", "RJ", "MG", "DF", "BA", "RS")),
+            "Municipio": rand.choice(("São Paulo", "Rio de Janeiro", "Belo Horizonte", "Brasília")),
+        }
+
+
+def _members(year: int, pedidos_count: int, seed: int) -> typing.Iterator[tuple]:
+    """
+    :return: Generator<(member marker, element, record type, records)>
+    """
+    yield "Pedidos", "Pedido", Pedido, pedidos(year, pedidos_count, seed)
+    yield "Recursos", "Recurso", Recurso, recursos(year, max(1, pedidos_count // 10), pedidos_count, seed)
+    yield "Solicitantes", "Solicitante", Solicitante, solicitantes(max(1, pedidos_count // 3), seed)
+
+
+def build_archive(path: str, year: int, file_format: str, pedidos_count: int, seed: int = 0) -> str:
+    """
+    Writes Arquivos_<format>_<year>.zip with the Pedidos, Recursos and Solicitantes files of the year.
+    The records are streamed into the zip, memory does not depend on the size.
+    :param path: Output directory
+    :param year: Year of the records
+    :param file_format: CSV or XML
+    :param pedidos_count: Number of pedidos (recursos are 10% and solicitantes 1/3 of it)
+    :param seed: Random seed
+    :return: Zip location
+    """
+    file_format = file_format.lower()
+    os.makedirs(path, exist_ok=True)
+    zip_path = os.path.join(path, f"Arquivos_{file_format}_{year}.zip")
+
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_obj:
+        for marker, element, record_type, records in _members(year, pedidos_count, seed):
+            name = f"{year}0101_{marker}_{file_format}_{year}.{file_format}"
+
+            with zip_obj.open(name, "w", force_zip64=True) as handler:
+                if file_format == "xml":
+                    _write_xml(handler, marker, element, records)
+                else:
+                    _write_csv(handler, record_type, records)
+
+    return zip_path
+
+
+def _write_xml(handler: typing.BinaryIO, marker: str, element: str, records: typing.Iterable[dict]):
+    handler.write(f'<?xml version="1.0" encoding="utf-8"?>\n<{marker}>\n'.encode("utf-8"))
+
+    for record in records:
+        attributes = " ".join(f"{key}={quoteattr(value)}" for key, value in record.items())
+        handler.write(f"<{element} {attributes} />\n".encode("utf-8"))
+
+    handler.write(f"</{marker}>\n".encode("utf-8"))
+
+
+def _write_csv(handler: typing.BinaryIO, record_type: type, records: typing.Iterable[dict]):
+    # Like the portal: no header, ";" as delimiter and no quotes.
+    for record in records:
+        row = ";".join(record.get(field, "").replace(";", ",") for field in record_type._fields)
+        handler.write(f"{row}\r\n".encode("utf-8"))
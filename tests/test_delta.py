@@ -0,0 +1,57 @@
+from E_Sic.pedidos_respostas import FingerprintStore, SQLiteSink
+from E_Sic.pedidos_respostas.delta import CHANGED, INSERTED, REMOVED
+from E_Sic.pedidos_respostas.types import Pedido, Recurso
+
+
+def _pedido(id_pedido: str, resposta: str = "Resposta") -> Pedido:
+    return Pedido(IdPedido=id_pedido, ProtocoloPedido=f"99901{id_pedido}", Resposta=resposta)
+
+
+def _recurso(id_recurso: str, id_pedido: str = "1") -> Recurso:
+    return Recurso(IdRecurso=id_recurso, IdPedido=id_pedido, ProtocoloPedido=f"99901{id_pedido}")
+
+
+def _actions(changes: list) -> list:
+    return [(change.action, change.record_type.__name__, change.key) for change in changes]
+
+
+def test_inserted_changed_and_removed(tmp_path):
+    with FingerprintStore(str(tmp_path / "fingerprints.db")) as store:
+        assert _actions(store.diff([_pedido("1"), _pedido("2")], scope="2016:XML")) == [
+            (INSERTED, "Pedido", 1), (INSERTED, "Pedido", 2)
+        ]
+        assert _actions(store.diff([_pedido("1", "Outra resposta"), _pedido("3")], scope="2016:XML")) == [
+            (CHANGED, "Pedido", 1), (INSERTED, "Pedido", 3), (REMOVED, "Pedido", 2)
+        ]
+        assert not list(store.diff([_pedido("1", "Outra resposta"), _pedido("3")], scope="2016:XML"))
+
+        # Other scope, other snapshot.
+        assert len(list(store.diff([_pedido("1")], scope="2017:XML"))) == 1
+
+
+def test_interrupted_diff_is_compared_again(tmp_path):
+    with FingerprintStore(str(tmp_path / "fingerprints.db")) as store:
+        next(store.diff([_pedido("1"), _pedido("2")]))
+
+        assert len(list(store.diff([_pedido("1"), _pedido("2")]))) == 2
+
+
+def test_files_of_each_type_share_the_scope(tmp_path):
+    """
+    The Pedidos and Recursos files of a year are diffed one by one, a type missing from a file is not removed.
+    """
+    with FingerprintStore(str(tmp_path / "fingerprints.db")) as store, \
+            SQLiteSink(str(tmp_path / "esic.db")) as sink:
+        sink.apply(store.diff([_pedido("1"), _pedido("2")], scope="2016:XML"))
+        sink.apply(store.diff([_recurso("10"), _recurso("11")], scope="2016:XML"))
+
+        assert not list(store.diff([_pedido("1"), _pedido("2")], scope="2016:XML"))
+
+        changes = list(store.diff([_recurso("10")], scope="2016:XML"))
+        assert _actions(changes) == [(REMOVED, "Recurso", 11)]
+        sink.apply(changes)
+
+        sink.apply(store.diff([_pedido("1")], scope="2016:XML"))
+
+        assert sink.connection.execute("SELECT COUNT(*) FROM pedidos").fetchone() == (1,)
+        assert sink.connection.execute("SELECT IdRecurso FROM recursos").fetchall() == [(10,)]
@@ -0,0 +1,150 @@
+import asyncio, os, sys, zipfile
+import pytest
+from aiohttp import web
+from E_Sic.pedidos_respostas import BuscarPedidosRespostas, DownloadManifest
+from E_Sic.pedidos_respostas.manifest import ManifestEntry
+from E_Sic.pedidos_respostas.search import AsyncBuscarPedidosRespostas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from portal import Portal  # noqa: E402
+import synthetic  # noqa: E402
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return synthetic.build_archive(str(tmp_path / "portal"), 2019, "XML", 6000)
+
+
+def _members(zip_path: str) -> dict:
+    with zipfile.ZipFile(zip_path) as zip_obj:
+        return {name: zip_obj.read(name) for name in zip_obj.namelist()}
+
+
+def test_stale_part_is_not_spliced(tmp_path, archive):
+    """
+    A part left by a run that downloaded another version of the file is discarded, not resumed.
+    """
+    part = tmp_path / (os.path.basename(archive) + ".part")
+    part.write_bytes(b"PK\x03\x04 old version of the file" * 100)
+    (tmp_path / (part.name + ".validator")).write_text('"old-etag"')
+
+    with Portal({(2019, "XML"): archive}) as portal, BuscarPedidosRespostas(url=portal.url) as client:
+        files = list(client.download_xml(2019, path=str(tmp_path), extract=False))
+
+    assert _members(files[0]) == _members(archive)
+    assert not part.exists() and not os.path.exists(f"{part}.validator")
+
+
+def test_part_of_the_same_version_is_resumed(tmp_path, archive):
+    positions = []
+
+    def interrupt(position, total):
+        if position > total // 2:
+            raise Interrupted()
+
+    with Portal({(2019, "XML"): archive}) as portal, BuscarPedidosRespostas(url=portal.url) as client:
+        with pytest.raises(Interrupted):
+            list(client.download_xml(2019, path=str(tmp_path), extract=False, progress=interrupt))
+
+        files = list(client.download_xml(2019, path=str(tmp_path), extract=False,
+                                         progress=lambda position, total: positions.append(position)))
+
+    # The first chunk written by the second run starts after the bytes of the first one.
+    assert positions[0] > os.path.getsize(archive) // 2
+    assert _members(files[0]) == _members(archive)
+
+
+def test_unchanged_requires_a_validator():
+    entry = ManifestEntry(file_name="Arquivos_xml_2019.zip", size=100)
+
+    assert not DownloadManifest.is_unchanged(entry, "Arquivos_xml_2019.zip", 100)
+    assert DownloadManifest.is_unchanged(entry._replace(etag='"a"'), "Arquivos_xml_2019.zip", 100, etag='"a"')
+    assert not DownloadManifest.is_unchanged(entry._replace(etag='"a"'), "Arquivos_xml_2019.zip", 100, etag='"b"')
+
+
+class PreconditionPortal(Portal):
+    """
+    Answers the conditional POST like IIS does: 412 when the ETag still matches.
+    """
+
+    async def _download(self, request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            self.requests["POST"] += 1
+            return web.Response(status=412)
+
+        response = await super()._download(request)
+        response.headers["ETag"] = '"v1"'
+        return response
+
+
+def test_precondition_failed_means_unchanged(tmp_path, archive):
+    manifest = DownloadManifest(str(tmp_path))
+
+    with PreconditionPortal({(2019, "XML"): archive}) as portal, BuscarPedidosRespostas(url=portal.url) as client:
+        first = list(client.download_xml(2019, path=str(tmp_path), manifest=manifest))
+        second = list(client.download_xml(2019, path=str(tmp_path), manifest=manifest))
+
+    assert first == second and all(map(os.path.exists, second))
+    assert portal.requests["POST"] == 2
+
+
+def test_attachment_part_is_resumed_only_for_the_same_version(tmp_path):
+    """
+    Attachment parts kept across runs follow the same rule: Range + If-Range with the validator saved next to them.
+    """
+    content = bytes(range(256)) * 400
+    ranges = []
+
+    async def attachment(request):
+        if_range = request.headers.get("If-Range")
+        ranges.append((request.headers.get("Range"), if_range))
+        headers = {"ETag": '"v2"', "Accept-Ranges": "bytes"}
+
+        if request.http_range.start is not None and if_range == '"v2"':
+            start = request.http_range.start
+            headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+            return web.Response(status=206, body=content[start:], headers=headers)
+
+        return web.Response(body=content, headers=headers)
+
+    async def download(part_path: str) -> bytes:
+        app = web.Application()
+        app.router.add_get("/resposta.pdf", attachment)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+
+        try:
+            async with AsyncBuscarPedidosRespostas(backoff=0) as client:
+                url = f"http://127.0.0.1:{runner.addresses[0][1]}/resposta.pdf"
+                with open(await client._download_file_get(url, part_path), "rb") as handler:
+                    return handler.read()
+        finally:
+            await runner.cleanup()
+
+    part = tmp_path / "resposta.part"
+    validator = tmp_path / "resposta.part.validator"
+
+    # Left by a run that downloaded another version: downloaded again from the start.
+    part.write_bytes(b"old version" * 100)
+    validator.write_text('"v1"')
+    assert asyncio.run(download(str(part))) == content
+    assert ranges[-1] == ("bytes=1100-", '"v1"')
+
+    # Left by a run without a validator: nothing tells which version it holds.
+    part.write_bytes(content[:1000])
+    assert asyncio.run(download(str(part))) == content
+    assert ranges[-1] == (None, None)
+
+    # Same version: only the missing bytes are requested.
+    part.write_bytes(content[:1000])
+    validator.write_text('"v2"')
+    assert asyncio.run(download(str(part))) == content
+    assert ranges[-1] == ("bytes=1000-", '"v2"')
+    assert not validator.exists()
@@ -0,0 +1,78 @@
+from E_Sic.pedidos_respostas import FullTextIndex
+from E_Sic.pedidos_respostas.types import Pedido, Recurso
+
+
+def _pedido(id_pedido: str, resumo: str, orgao: str = "MS - Ministério da Saúde", year: int = 2021) -> Pedido:
+    return Pedido(IdPedido=id_pedido, ProtocoloPedido=f"99901{id_pedido}", ResumoSolicitacao=resumo,
+                  OrgaoDestinatario=orgao, DataRegistro=f"10/03/{year} 08:00:00")
+
+
+def _recurso(id_recurso: str, desc: str) -> Recurso:
+    return Recurso(IdRecurso=id_recurso, IdPedido="1", ProtocoloPedido="999011", DescRecurso=desc,
+                   OrgaoDestinatario="MS - Ministério da Saúde", DataRegistro="20/03/2021 08:00:00")
+
+
+def _keys(hits: list) -> list:
+    return sorted((hit.record_type.__name__, hit.key) for hit in hits)
+
+
+def test_record_added_twice_in_a_segment_is_replaced(tmp_path):
+    with FullTextIndex(str(tmp_path / "search.db")) as index:
+        index.add([_pedido("1", "vacina")])
+        index.add([_pedido("1", "vacina covid")])
+        index.flush()
+
+        assert len(index) == 1
+        assert _keys(index.search("vacina")) == [("Pedido", 1)]
+
+        # And across segments.
+        index.add([_pedido("1", "licitação")])
+        index.flush()
+
+        assert len(index) == 1
+        assert not index.search("vacina")
+        assert _keys(index.search("licitações")) == [("Pedido", 1)]
+
+
+def test_segments_are_merged(tmp_path):
+    with FullTextIndex(str(tmp_path / "search.db"), segment_size=2, merge_factor=2) as index:
+        index.add(_pedido(str(key), f"contrato número{key}") for key in range(1, 9))
+        index.flush()
+
+        # 4 segments of 2 => 2 of 4 => 1 of 8
+        assert index._connection.execute("SELECT documents FROM segments").fetchall() == [(8,)]
+        assert len(index) == 8
+        assert len(index.search("contrato", limit=20)) == 8
+        assert _keys(index.search("número5")) == [("Pedido", 5)]
+
+
+def test_removed_documents_are_not_found(tmp_path):
+    with FullTextIndex(str(tmp_path / "search.db")) as index:
+        index.add([_pedido("1", "vacina"), _pedido("2", "vacina")])
+        index.remove(Pedido, 1)
+
+        assert len(index) == 1
+        assert _keys(index.search("vacina")) == [("Pedido", 2)]
+
+        # The postings are dropped by the merge, the document is still not found.
+        index.optimize()
+
+        assert _keys(index.search("vacina")) == [("Pedido", 2)]
+
+
+def test_filters(tmp_path):
+    with FullTextIndex(str(tmp_path / "search.db")) as index:
+        index.add([
+            _pedido("1", "vacina"),
+            _pedido("2", "vacina", orgao="ME - Ministério da Economia"),
+            _pedido("3", "vacina", year=2020),
+            _recurso("4", "vacina"),
+        ])
+        index.flush()
+
+        assert _keys(index.search("vacina")) == [("Pedido", 1), ("Pedido", 2), ("Pedido", 3), ("Recurso", 4)]
+        assert _keys(index.search("vacina", orgao="ME - Ministério da Economia")) == [("Pedido", 2)]
+        assert _keys(index.search("vacina", orgao="Outro")) == []
+        assert _keys(index.search("vacina", year=2020)) == [("Pedido", 3)]
+        assert _keys(index.search("vacina", record_type=Recurso)) == [("Recurso", 4)]
+        assert _keys(index.search("vacina", year=2021, record_type=Pedido)) == [("Pedido", 1), ("Pedido", 2)]
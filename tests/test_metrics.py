@@ -0,0 +1,55 @@
+import asyncio, os, sys
+from E_Sic.pedidos_respostas import BuscarPedidosRespostas, DownloadManifest, Metrics
+from E_Sic.pedidos_respostas.resolver import AsyncResolver, Resolved, ResolverCache
+from E_Sic.pedidos_respostas.types import Pedido
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from portal import Portal  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def _cache(metrics: Metrics, cache: str) -> dict:
+    return {dict(labels)["result"]: value for (name, labels), value in metrics.counters.items()
+            if name == "cache" and dict(labels)["cache"] == cache}
+
+
+def test_form_and_manifest_cache(tmp_path):
+    archive = synthetic.build_archive(str(tmp_path / "portal"), 2019, "XML", 100)
+    manifest = DownloadManifest(str(tmp_path))
+    metrics = Metrics()
+
+    with Portal({(2019, "XML"): archive}) as portal, \
+            BuscarPedidosRespostas(url=portal.url, metrics=metrics) as client:
+        list(client.download_xml(2019, path=str(tmp_path), manifest=manifest))
+        list(client.download_xml(2019, path=str(tmp_path), manifest=manifest))
+
+    assert _cache(metrics, "form") == {"miss": 1, "hit": 1}
+    assert _cache(metrics, "manifest") == {"miss": 1, "hit": 1}
+
+
+def test_resolver_cache(tmp_path):
+    class FakeResolver(AsyncResolver):
+        async def resolve_one(self, protocolo: str) -> Resolved:
+            return Resolved(f"http://item/ID={protocolo}", frozenset())
+
+    metrics = Metrics()
+    records = [Pedido(ProtocoloPedido="1")]
+
+    with ResolverCache(str(tmp_path / "cache.db")) as cache:
+        asyncio.run(FakeResolver(None, cache, metrics=metrics).resolve(records))
+        asyncio.run(FakeResolver(None, cache, metrics=metrics).resolve(records))
+
+    assert _cache(metrics, "resolver") == {"miss": 1, "hit": 1}
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.cache_hit("form")
+    metrics.increment("records", 10, record_type="Pedido")
+    metrics.observe("parse", 2.0, record_type="Pedido")
+
+    text = metrics.to_prometheus()
+
+    assert 'esic_cache_total{cache="form",result="hit"} 1' in text
+    assert 'esic_records_per_second{record_type="Pedido"} 5.0' in text
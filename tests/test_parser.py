@@ -0,0 +1,126 @@
+import zipfile
+import pytest
+from E_Sic.pedidos_respostas import FileParser
+from E_Sic.pedidos_respostas.types import Pedido
+
+
+def _write(tmp_path, name, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+XML_WITH_CONTROL_CHARACTERS = (
+    b'<?xml version="1.0" encoding="utf-8"?>\n<Pedidos>\n'
+    b'<Pedido IdPedido="1" Resposta="antes\x0bdepois" />\n'
+    b'<Pedido IdPedido="2" Resposta="sem\x01controle" />\n'
+    b'<Pedido IdPedido="3" Resposta="ok" />\n'
+    b'</Pedidos>\n'
+)
+
+
+def test_xml_recovers_from_control_characters(tmp_path):
+    file_name = _write(tmp_path, "20190101_Pedidos_xml_2019.xml", XML_WITH_CONTROL_CHARACTERS)
+
+    records = list(FileParser(file_name).open())
+
+    assert [record.id_pedido for record in records] == [1, 2, 3]
+    assert records[2]["Resposta"] == "ok"
+
+
+def test_xml_recovers_from_control_characters_inside_zip(tmp_path):
+    zip_path = str(tmp_path / "Arquivos_xml_2019.zip")
+
+    with zipfile.ZipFile(zip_path, "w") as zip_obj:
+        zip_obj.writestr("20190101_Pedidos_xml_2019.xml", XML_WITH_CONTROL_CHARACTERS)
+
+    assert [record.id_pedido for record in FileParser(zip_path).open()] == [1, 2, 3]
+
+
+def test_zip_members_with_upper_case_suffix(tmp_path):
+    zip_path = str(tmp_path / "Arquivos_xml_2019.zip")
+
+    with zipfile.ZipFile(zip_path, "w") as zip_obj:
+        zip_obj.writestr("20190101_Pedidos_xml_2019.XML", XML_WITH_CONTROL_CHARACTERS)
+
+    assert [record.id_pedido for record in FileParser(zip_path).open()] == [1, 2, 3]
+
+
+def _pedido(id_pedido: int, **values) -> dict:
+    row = {field: "" for field in Pedido._fields}
+    row.update(IdPedido=str(id_pedido), ProtocoloPedido=f"9990100000{id_pedido:04d}2019", OrgaoDestinatario="MEC",
+               Situacao="Respondido", DataRegistro="02/01/2019 10:00:00", ResumoSolicitacao="Resumo",
+               DetalhamentoSolicitacao="Detalhes", PrazoAtendimento="22/01/2019", IdSolicitante="5",
+               NumeroPerguntas="1", DataResposta="10/01/2019 10:00:00", Resposta="Resposta")
+    row.update(values)
+    return row
+
+
+def _csv(*rows: dict, header: bool = False) -> str:
+    lines = [";".join(Pedido._fields)] if header else []
+    lines += [";".join(row[field] for field in Pedido._fields) for row in rows]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _parse_csv(tmp_path, text: str, encoding: str = "utf-8") -> list:
+    return list(FileParser(_write(tmp_path, "20190101_Pedidos_csv_2019.csv", text.encode(encoding))).open())
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "cp1252"])
+def test_csv_encodings(tmp_path, encoding):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, Resposta="Informação"), _pedido(2)), encoding)
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["Resposta"] == "Informação"
+
+
+def test_csv_header_and_nul_bytes_are_ignored(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, Resposta="com\0nulo"), _pedido(2), header=True))
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["Resposta"] == "comnulo"
+
+
+def test_csv_line_break_in_text(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, DetalhamentoSolicitacao="linha 1\r\nlinha 2\r\n\r\nlinha 4"),
+                                        _pedido(2)))
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["DetalhamentoSolicitacao"] == "linha 1\nlinha 2\n\nlinha 4"
+    assert records[0]["Resposta"] == "Resposta"
+
+
+def test_csv_delimiter_in_text(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, Resposta="a;b;c"), _pedido(2)))
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["Resposta"] == "a;b;c"
+    assert records[0]["TipoResposta"] == ""
+
+
+def test_csv_delimiter_and_line_break_in_text(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, DetalhamentoSolicitacao="a;b\r\nc"), _pedido(2)))
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["DetalhamentoSolicitacao"] == "a;b\nc"
+    assert records[0]["PrazoAtendimento"] == "22/01/2019"
+
+
+def test_csv_text_line_starting_with_a_number(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, DetalhamentoSolicitacao="itens:\r\n2 computadores"), _pedido(2)))
+
+    assert [record.id_pedido for record in records] == [1, 2]
+    assert records[0]["DetalhamentoSolicitacao"] == "itens:\n2 computadores"
+
+
+def test_csv_unmatched_quote_does_not_swallow_the_file(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, ResumoSolicitacao='"abc pedido sem fechar'), _pedido(2), _pedido(3)))
+
+    assert [record.id_pedido for record in records] == [1, 2, 3]
+    assert records[0]["ResumoSolicitacao"] == '"abc pedido sem fechar'
+
+
+def test_csv_quotes_are_kept(tmp_path):
+    records = _parse_csv(tmp_path, _csv(_pedido(1, ResumoSolicitacao='"Lei de acesso" pedido'), _pedido(2)))
+
+    assert records[0]["ResumoSolicitacao"] == '"Lei de acesso" pedido'
@@ -0,0 +1,75 @@
+import asyncio
+from aiohttp import web
+from E_Sic.pedidos_respostas import AsyncBuscarPedidosRespostas, resolver
+from E_Sic.pedidos_respostas.resolver import AsyncResolver, Resolved, ResolverCache
+from E_Sic.pedidos_respostas.types import Pedido
+
+
+class FakeResolver(AsyncResolver):
+    def __init__(self, cache: ResolverCache, found: dict):
+        super().__init__(None, cache)
+        self.found = found
+        self.resolved = []
+
+    async def resolve_one(self, protocolo: str) -> Resolved:
+        self.resolved.append(protocolo)
+        return Resolved(self.found.get(protocolo, ""), frozenset())
+
+
+def test_not_found_protocols_are_not_cached(tmp_path):
+    records = [Pedido(ProtocoloPedido="1"), Pedido(ProtocoloPedido="2")]
+
+    with ResolverCache(str(tmp_path / "cache.db")) as cache:
+        first = FakeResolver(cache, {"1": "http://item/ID=1"})
+        asyncio.run(first.resolve(records))
+
+        second = FakeResolver(cache, {"1": "http://item/ID=1", "2": "http://item/ID=2"})
+        results = asyncio.run(second.resolve(records))
+
+    assert second.resolved == ["2"]
+    assert results["2"].url == "http://item/ID=2"
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    calls = {"query": 0}
+
+    async def search(request):
+        return web.Response(text='<input type="hidden" name="__REQUESTDIGEST" value="digest" />',
+                            content_type="text/html")
+
+    async def query(request):
+        calls["query"] += 1
+
+        if calls["query"] == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+
+        return web.json_response([{"Path": f"{request.url.origin()}/item?ID=5"}])
+
+    async def item(request):
+        return web.Response(text='<a href="/Lists/Pedido/Attachments/5/resposta.pdf">resposta.pdf</a>',
+                            content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/search", search)
+        app.router.add_post("/query", query)
+        app.router.add_get("/item", item)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        origin = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        monkeypatch.setattr(resolver, "_SEARCH_REQUEST_PROTOCOL", f"{origin}/search?k=")
+        monkeypatch.setattr(resolver, "_PROCESS_QUERY_URL", f"{origin}/query")
+
+        try:
+            async with AsyncBuscarPedidosRespostas(backoff=0) as client:
+                return await client.resolve_attachments([Pedido(ProtocoloPedido="5")])
+        finally:
+            await runner.cleanup()
+
+    results = asyncio.run(run())
+
+    assert calls["query"] == 2
+    assert results["5"].url.endswith("/item?ID=5")
+    assert [name for url, name in results["5"].attachments] == ["resposta.pdf"]
@@ -0,0 +1,47 @@
+from E_Sic.pedidos_respostas import SQLiteSink
+from E_Sic.pedidos_respostas.delta import Change, CHANGED, REMOVED
+from E_Sic.pedidos_respostas.types import Pedido
+
+
+def _indexes(sink: SQLiteSink) -> set:
+    return {name for name, in sink.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                      "AND name LIKE 'idx_%'")}
+
+
+def _pedido(id_pedido: str, resposta: str = "Resposta") -> Pedido:
+    return Pedido(IdPedido=id_pedido, ProtocoloPedido=f"99901{id_pedido}", Resposta=resposta)
+
+
+def test_records_without_id_are_skipped(tmp_path):
+    with SQLiteSink(str(tmp_path / "esic.db")) as sink:
+        assert sink.ingest([_pedido(""), _pedido("1")]) == 1
+        assert sink.ingest([_pedido(""), _pedido("1")]) == 1
+        assert sink.connection.execute("SELECT COUNT(*) FROM pedidos").fetchone() == (1,)
+
+
+def test_bulk_load_builds_the_indexes_once(tmp_path):
+    database = str(tmp_path / "esic.db")
+
+    with SQLiteSink(database) as sink:
+        sink.ingest([_pedido("1")])
+        sink.ingest([_pedido("2")])
+
+        # Still loading, the indexes come back in finish() (or close()).
+        assert not _indexes(sink)
+
+        sink.finish()
+        assert len(_indexes(sink)) == 6
+
+    with SQLiteSink(database) as sink:
+        sink.ingest([_pedido("3")])
+        assert len(_indexes(sink)) == 6
+
+
+def test_apply_keeps_the_indexes(tmp_path):
+    with SQLiteSink(str(tmp_path / "esic.db")) as sink:
+        sink.ingest([_pedido("1"), _pedido("2")])
+        sink.finish()
+
+        assert sink.apply([Change(CHANGED, Pedido, 1, _pedido("1", "Nova")), Change(REMOVED, Pedido, 2)]) == (1, 1)
+        assert len(_indexes(sink)) == 6
+        assert sink.connection.execute("SELECT IdPedido, Resposta FROM pedidos").fetchall() == [(1, "Nova")]